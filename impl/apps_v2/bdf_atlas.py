@@ -0,0 +1,55 @@
+import os
+import numpy as np
+from bdfparser import Font
+
+class GlyphAtlas:
+    """Every glyph of a BDF font rasterized once into a single packed NumPy mask.
+
+    render() slices strings out of the mask (TextRenderCache colours and
+    caches them), so bdfparser is only touched at startup.
+    """
+
+    def __init__(self, font_path, missing="?"):
+        font = Font(font_path)
+        self.name = os.path.basename(font_path)
+        self.height = font.headers['fbby']
+
+        # codepoint -> (x offset into self.mask, advance width)
+        self.index = {}
+        columns = []
+        x = 0
+        for glyph in font.iterglyphs():
+            codepoint = glyph.meta['codepoint']
+            if codepoint is None or codepoint < 0:
+                continue
+            # Draw through the font (not the glyph) so each cell carries the
+            # same baseline/bounding-box padding as font.draw() on a string
+            bitmap = np.array(font.draw(chr(codepoint)).todata(2), dtype=bool)
+            if bitmap.shape[0] != self.height:
+                continue
+            self.index[codepoint] = (x, bitmap.shape[1])
+            columns.append(bitmap)
+            x += bitmap.shape[1]
+
+        self.mask = np.hstack(columns) if columns else np.zeros((self.height, 0), dtype=bool)
+        self.missing = self.index.get(ord(missing)) if missing else None
+        print(f"[Glyph Atlas] Rasterized {len(self.index)} glyphs from {self.name} ({self.mask.nbytes} bytes)")
+
+    def _cells(self, text):
+        """Atlas cells for each character, substituting the missing glyph"""
+        cells = []
+        for ch in text:
+            cell = self.index.get(ord(ch), self.missing)
+            if cell is not None:
+                cells.append(cell)
+        return cells
+
+    def render(self, text):
+        """Boolean (height, width) mask for a string"""
+        cells = self._cells(text)
+        if not cells:
+            return np.zeros((self.height, 0), dtype=bool)
+        if len(cells) == 1:
+            x, width = cells[0]
+            return self.mask[:, x:x + width]
+        return np.hstack([self.mask[:, x:x + width] for x, width in cells])
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+
+def union_bbox(a, b):
+    """Union of two (left, top, right, bottom) boxes, either of which may be None"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+class Layer:
+    """An RGBA layer with a dirty flag and the bounding box of its pending changes"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.pixels = np.zeros((height, width, 4), dtype=np.uint8)
+        self.dirty = True
+        self.bbox = (0, 0, width, height)
+
+    def mark_dirty(self, bbox=None):
+        """Flag a region (default: the whole layer) for recomposition"""
+        self.dirty = True
+        self.bbox = union_bbox(self.bbox, bbox or (0, 0, self.width, self.height))
+
+    def clear(self, bbox=None):
+        """Make a region (default: the whole layer) transparent"""
+        left, top, right, bottom = bbox or (0, 0, self.width, self.height)
+        self.pixels[top:bottom, left:right] = 0
+        self.mark_dirty(bbox)
+
+    def fill(self, color):
+        """Fill the whole layer with an opaque color"""
+        self.pixels[:] = tuple(color) + (255,)
+        self.mark_dirty()
+
+    def paste(self, rgb, x, y):
+        """Copy an opaque (h, w, 3) array into the layer, clipped to its bounds"""
+        h = min(rgb.shape[0], self.height - y)
+        w = min(rgb.shape[1], self.width - x)
+        if h > 0 and w > 0:
+            self.pixels[y:y + h, x:x + w, :3] = rgb[:h, :w]
+            self.pixels[y:y + h, x:x + w, 3] = 255
+            self.mark_dirty((x, y, x + w, y + h))
+
+class Compositor:
+    """Stacks named layers bottom-to-top into an RGB frame.
+
+    Only the union of the dirty layers' bounding boxes is re-blitted, and when
+    nothing is dirty the previous Image object is returned unchanged.
+    """
+
+    def __init__(self, width, height, layer_names):
+        self.width = width
+        self.height = height
+        self.layers = OrderedDict((name, Layer(width, height)) for name in layer_names)
+        self.buffer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.image = None
+        self.composed = 0
+        self.reused = 0
+
+    def __getitem__(self, name):
+        return self.layers[name]
+
+    def compose(self):
+        """Return the composited frame as a PIL Image"""
+        bbox = None
+        for layer in self.layers.values():
+            if layer.dirty:
+                bbox = union_bbox(bbox, layer.bbox)
+
+        if bbox is None and self.image is not None:
+            self.reused += 1
+            return self.image
+
+        left, top, right, bottom = bbox or (0, 0, self.width, self.height)
+        out = self.buffer[top:bottom, left:right]
+        out[:] = 0
+        for layer in self.layers.values():
+            region = layer.pixels[top:bottom, left:right]
+            opaque = region[..., 3] != 0
+            out[opaque] = region[..., :3][opaque]
+            layer.dirty = False
+            layer.bbox = None
+
+        self.composed += 1
+        self.image = Image.fromarray(self.buffer)
+        return self.image
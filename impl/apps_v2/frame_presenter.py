@@ -0,0 +1,40 @@
+class FramePresenter:
+    """Shows frames on the matrix through an offscreen canvas.
+
+    Each new frame is drawn into a canvas from CreateFrameCanvas() and
+    swapped in with SwapOnVSync(), so the panel never shows a half-written
+    frame. Frames that are the same object as the last one presented (the
+    apps and compositor hand back their cached Image when nothing changed),
+    or have identical pixels, are skipped without touching the matrix.
+    Works with both rpi-rgb-led-matrix and RGBMatrixEmulator.
+    """
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.canvas = matrix.CreateFrameCanvas()
+        self.last_frame = None
+        self.last_pixels = None
+        self.presented = 0
+        self.skipped = 0
+
+    def present(self, frame, force=False):
+        """Swap frame onto the panel unless it is already showing; returns True if it was presented"""
+        if not force and frame is self.last_frame:
+            self.skipped += 1
+            return False
+        pixels = frame.tobytes()
+        if not force and pixels == self.last_pixels:
+            self.last_frame = frame
+            self.skipped += 1
+            return False
+
+        self.canvas.SetImage(frame)
+        # The returned canvas is the previous front buffer, redrawn in full next time
+        self.canvas = self.matrix.SwapOnVSync(self.canvas)
+        self.last_frame = frame
+        self.last_pixels = pixels
+        self.presented += 1
+        return True
+
+    def stats(self):
+        return {'presented': self.presented, 'skipped': self.skipped}
@@ -0,0 +1,88 @@
+import time
+
+class FrameScheduler:
+    """Paces the render loop on monotonic deadlines instead of a fixed sleep.
+
+    Each deadline is the previous deadline plus the frame period, not the
+    time rendering finished plus a delay, so render time doesn't add to the
+    period and the rate doesn't drift with load. Apps declare the rate they
+    want (high while text scrolls, about 1 Hz for a static board) and may
+    hint when their next visible change happens, which pulls the next
+    deadline forward. A frame that starts later than its deadline counts as
+    a miss; misses are summarised every log_interval seconds, and a loop
+    that fell more than a period behind re-anchors instead of bursting
+    frames to catch up.
+    """
+
+    def __init__(self, max_fps=30, min_fps=0.1, tolerance=0.005, log_interval=60,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.tolerance = tolerance  # Seconds late before a frame counts as missed
+        self.log_interval = log_interval
+        self.clock = clock
+        self.sleep = sleep
+        self.deadline = None
+
+        # Totals since start, plus the current logging window
+        self.frames = 0
+        self.missed = 0
+        self.window_start = clock()
+        self.window_frames = 0
+        self.window_missed = 0
+        self.window_worst = 0.0
+
+    def next_deadline(self, fps, next_change=None, now=None):
+        """Monotonic time the next frame is due at fps, or earlier at next_change"""
+        now = self.clock() if now is None else now
+        if self.deadline is None:
+            return now
+        period = 1.0 / min(self.max_fps, max(self.min_fps, fps))
+        deadline = self.deadline + period
+        if next_change is not None and next_change < deadline:
+            # Never earlier than the fastest allowed rate
+            deadline = max(next_change, self.deadline + 1.0 / self.max_fps)
+        return deadline
+
+    def wait(self, fps, next_change=None):
+        """Sleep until the next frame is due; returns its deadline"""
+        now = self.clock()
+        deadline = self.next_deadline(fps, next_change, now)
+        lateness = now - deadline
+        if lateness > self.tolerance:
+            self._record_miss(lateness)
+            if lateness > 1.0 / min(self.max_fps, max(self.min_fps, fps)):
+                deadline = now  # Too far behind: drop the lost frames and re-anchor
+        elif lateness < 0:
+            self.sleep(-lateness)
+        self.deadline = deadline
+        self.frames += 1
+        self.window_frames += 1
+        self._maybe_log()
+        return deadline
+
+    def reset(self):
+        """Start a fresh timeline (after the loop was paused on purpose, which isn't a miss)"""
+        self.deadline = None
+
+    def stats(self):
+        return {'frames': self.frames, 'missed': self.missed}
+
+    def _record_miss(self, lateness):
+        self.missed += 1
+        self.window_missed += 1
+        self.window_worst = max(self.window_worst, lateness)
+
+    def _maybe_log(self):
+        now = self.clock()
+        elapsed = now - self.window_start
+        if elapsed < self.log_interval:
+            return
+        if self.window_missed:
+            print(f"[Frame Scheduler] {self.window_missed}/{self.window_frames} frames missed their deadline "
+                  f"in the last {elapsed:.0f}s (worst {self.window_worst * 1000:.0f} ms late, "
+                  f"{self.window_frames / elapsed:.1f} fps)")
+        self.window_start = now
+        self.window_frames = 0
+        self.window_missed = 0
+        self.window_worst = 0.0
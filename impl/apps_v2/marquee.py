@@ -0,0 +1,76 @@
+import time
+import numpy as np
+
+class Marquee:
+    """Looping marquee over a pre-rendered `text + gap + text` strip.
+
+    The scroll position is derived from a monotonic clock rather than a
+    per-frame increment, so speed is independent of frame rate and render
+    jitter. With a delay the marquee holds at offset 0 first, and with
+    loop=False it stops after one pass until restart() is called, which
+    lets several marquees wait for each other. window() returns a
+    zero-copy slice of the strip; with subpixel
+    enabled the fractional offset is blended between neighbouring columns
+    (this assumes the text sits on a dark background).
+    """
+
+    def __init__(self, pixels, window_width, speed, gap=20, delay=0.0, loop=True, subpixel=False,
+                 clock=None):
+        self.height, self.text_width = pixels.shape[:2]
+        self.window_width = window_width
+        self.speed = speed          # Pixels per second
+        self.gap = gap              # Pixels between the end of the text and its repeat
+        self.delay = delay          # Seconds to hold at offset 0 after (re)starting
+        self.loop = loop            # False: stop after one pass until restart()
+        self.subpixel = subpixel
+        self.clock = clock or time.monotonic  # Looked up at construction so a replaced clock is honoured
+        self.period = self.text_width + gap
+
+        # Enough copies that any window starting inside one period (plus one
+        # column for sub-pixel blending) is a contiguous slice
+        strip_width = self.period + window_width + 1
+        self.strip = np.zeros((self.height, strip_width) + pixels.shape[2:], dtype=pixels.dtype)
+        for x in range(0, strip_width, self.period):
+            copy_width = min(self.text_width, strip_width - x)
+            self.strip[:, x:x + copy_width] = pixels[:, :copy_width]
+        self.strip.flags.writeable = False
+
+        self.start = self.clock()
+
+    def restart(self, now=None):
+        """Return to offset 0 (holding for delay) from now"""
+        self.start = self.clock() if now is None else now
+
+    def _distance(self, now):
+        now = self.clock() if now is None else now
+        return max(0.0, now - self.start - self.delay) * self.speed
+
+    def finished(self, now=None):
+        """True once a non-looping marquee has completed its pass"""
+        return not self.loop and self._distance(now) >= self.period
+
+    def offset(self, now=None):
+        """Current scroll position in (fractional) pixels, within [0, period)"""
+        distance = self._distance(now)
+        if not self.loop and distance >= self.period:
+            return 0.0
+        return distance % self.period
+
+    def next_step(self, now=None):
+        """Clock time the integer offset next changes, or None while a finished marquee is idle"""
+        now = self.clock() if now is None else now
+        distance = self._distance(now)
+        if not self.loop and distance >= self.period:
+            return None
+        return self.start + self.delay + (int(distance) + 1) / self.speed
+
+    def window(self, now=None):
+        """(height, window_width, C) view of the strip at the current offset"""
+        position = self.offset(now)
+        x = int(position)
+        view = self.strip[:, x:x + self.window_width]
+        fraction = position - x
+        if not self.subpixel or fraction == 0.0:
+            return view
+        following = self.strip[:, x + 1:x + 1 + self.window_width]
+        return (view * (1.0 - fraction) + following * fraction).astype(self.strip.dtype)
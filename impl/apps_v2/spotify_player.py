@@ -1,6 +1,7 @@
-import numpy as np, requests, math, time, threading
+import numpy as np, math, time, threading
 from PIL import Image, ImageFont, ImageDraw
-from io import BytesIO
+from apps_v2.marquee import Marquee
+from modules.art_cache import AlbumArtCache, AlbumArtFetcher
 
 class SpotifyScreen:
     def __init__(self, config, modules, fullscreen):
@@ -21,12 +22,31 @@ class SpotifyScreen:
         self.current_title = ''
         self.current_artist = ''
         self.current_frame = None
+        # Decoded 48px/64px art per URL, in memory and on disk, loaded off the render loop
+        self.art_cache = AlbumArtCache.from_config(config)
+        self.art_fetcher = AlbumArtFetcher(self.art_cache)
+        self.placeholder_art = {}
+        self.prefetched_art_url = None
 
-        self.title_animation_cnt = 0
-        self.artist_animation_cnt = 0
-        self.last_title_reset = math.floor(time.time())
-        self.last_artist_reset = math.floor(time.time())
+        # Title/artist are rasterized once per track into strips and scrolled by the clock
         self.scroll_delay = 4
+        self.scroll_speed = 12  # Pixels per second
+        self.spacer = "     "
+        self.text_x = 1
+        self.text_window = self.canvas_width - 13  # Visible text columns (x 1..51)
+        self.text_pad = 1  # Rows above the origin (accents)
+        ascent, descent = self.font.getmetrics()
+        self.text_height = self.text_pad + ascent + descent
+        self.title_strip = None
+        self.artist_strip = None
+        self.text_positions = None
+        self.idle_fps = 2  # Frame rate while nothing scrolls (picks up new polls promptly)
+
+        # Album art, progress bar and play/pause icon, reused until one of them changes
+        self.base_frame = None
+        self.base_key = None
+        self.composed_base = None
+        self.fullscreen_frame = None
 
         self.paused = True
         self.paused_time = math.floor(time.time())
@@ -39,40 +59,131 @@ class SpotifyScreen:
         self.spotify_module = self.modules['spotify']
 
         self.response = None
-        self.thread = threading.Thread(target=self.getCurrentPlaybackAsync)
-        self.thread.start()
+        self.response_time = time.monotonic()  # When self.response was received, for progress interpolation
+        self.polling = threading.Event()  # Cleared while suspended (deep sleep)
+        self.polling.set()
+        self.poll_now = threading.Event()  # Cuts the wait between polls short
+        # While another app is shown, check for playback starting every idle_check_interval; kept
+        # under the controller's 10 s auto fallback window so music takes the display back within it
+        self.idle_check = False
+        self.idle_check_interval = 8
+        self.thread = None  # Started by activate()
+        self.art_stats_interval = 3600  # Seconds between album art cache summaries in the log
+        self.art_stats_window_start = time.monotonic()
+        self.art_stats_at_window_start = self.art_cache.stats()
 
     def getCurrentPlaybackAsync(self):
         # delay spotify fetches
         time.sleep(3)
         while True:
+            self.polling.wait()
+            self.poll_now.clear()
             self.spotify_module.getCurrentPlayback()  # Puts data in queue on success, does nothing on failure
-            time.sleep(1)
+            next_art_url = getattr(self.spotify_module, 'next_art_url', None)
+            if next_art_url and next_art_url != self.prefetched_art_url:
+                # warm the art cache so the next track change displays instantly
+                self.prefetched_art_url = next_art_url
+                self.art_fetcher.prefetch(next_art_url)
+            self.logArtStats()
+            # slower while paused/idle, aligned to the predicted track end while playing
+            delay = self.spotify_module.nextPollDelay()
+            if self.idle_check and not self.spotify_module.isBackingOff():
+                delay = self.idle_check_interval
+            self.poll_now.wait(delay)
+
+    def logArtStats(self):
+        """Summarise album art cache hits and misses over the last art_stats_interval seconds"""
+        elapsed = time.monotonic() - self.art_stats_window_start
+        if elapsed < self.art_stats_interval:
+            return
+        stats = self.art_cache.stats()
+        window = {key: stats[key] - self.art_stats_at_window_start[key]
+                  for key in ('memory_hits', 'disk_hits', 'misses', 'evictions')}
+        if any(window.values()):
+            print(f"[Spotify] Album art in the last {elapsed / 60:.0f} min: {window['memory_hits']} memory hits, "
+                  f"{window['disk_hits']} disk hits, {window['misses']} downloads, {window['evictions']} evicted "
+                  f"({stats['entries']} decoded)")
+        self.art_stats_window_start = time.monotonic()
+        self.art_stats_at_window_start = stats
+
+    def activate(self):
+        """Start polling Spotify (the first call starts the poller thread)"""
+        if self.thread is None:
+            self.polling.set()
+            self.thread = threading.Thread(target=self.getCurrentPlaybackAsync)
+            self.thread.start()
+        else:
+            self.resume()
+
+    def suspend(self):
+        """Stop polling Spotify until resume()"""
+        self.polling.clear()
+
+    def resume(self):
+        """Poll again right away if suspended, so current playback is known by the next frames"""
+        if not self.polling.is_set():
+            self.polling.set()
+            self.poll_now.set()
+
+    def setIdleCheck(self, enabled):
+        """Drop to a low-rate check for playback starting while another app is shown"""
+        self.idle_check = enabled
+
+    def isActive(self):
+        """Whether the latest poll shows playback, without rendering a frame"""
+        self.receiveResponse()
+        return self.response is not None and bool(self.response[3])
 
     def generate(self):
+        self.receiveResponse()
+        return self.generateFrame(self.response)
+
+    def receiveResponse(self):
         if not self.spotify_module.queue.empty():
             self.response = self.spotify_module.queue.get()
+            self.response_time = time.monotonic()
             self.spotify_module.queue.queue.clear()
-        return self.generateFrame(self.response)
+
+    def frameRate(self):
+        """Frames per second this screen wants: one per scroll pixel while title/artist scroll, else idle_fps"""
+        if self.composed_base is not None and self.scrollingMarquees():
+            return self.scroll_speed
+        return self.idle_fps
+
+    def nextChange(self, now):
+        """Monotonic time of the next scroll step, progress bar pixel or switch to fullscreen art, or None"""
+        if self.composed_base is None or self.response is None:
+            return None
+        changes = [marquee.next_step(now) for marquee in self.scrollingMarquees()]
+        (_, _, _, _, progress_ms, duration_ms) = self.response
+        if self.is_playing:
+            if duration_ms:
+                # getBaseFrame draws progress_px = (percent // 1.57); find when it next steps
+                progress = self.interpolateProgress(progress_ms, duration_ms, now)
+                next_ms = ((progress / duration_ms) * 100 // 1.57 + 1) * 1.57 * duration_ms / 100
+                if next_ms <= duration_ms:
+                    changes.append(now + (next_ms - progress) / 1000)
+        else:
+            changes.append(now + self.paused_time + self.paused_delay - time.time())
+        changes = [change for change in changes if change is not None]
+        return min(changes) if changes else None
+
+    def scrollingMarquees(self):
+        return [strip[1] for strip in (self.title_strip, self.artist_strip) if strip is not None and strip[1] is not None]
 
     def generateFrame(self, response):
         if response is not None:
             (artist, title, art_url, self.is_playing, progress_ms, duration_ms) = response
 
             if self.full_screen_always:
-                if self.current_art_url != art_url:
-                    self.current_art_url = art_url
-                    response = requests.get(self.current_art_url)
-                    img = Image.open(BytesIO(response.content))
-                    self.current_art_img = img.resize((self.canvas_width, self.canvas_height), resample=Image.LANCZOS)
+                art_img = self.resolveArt(art_url, self.canvas_width)
+                if art_img is not self.current_art_img or self.current_frame is None:
+                    self.current_art_img = art_img
 
                     frame = Image.new("RGB", (self.canvas_width, self.canvas_height), (0,0,0))
-                    draw = ImageDraw.Draw(frame)
                     frame.paste(self.current_art_img, (0,0))
                     self.current_frame = frame
-                    return (frame, self.is_playing)
-                else:
-                    return (self.current_frame, self.is_playing)
+                return (self.current_frame, self.is_playing)
             else:
                 if not self.is_playing:
                     if not self.paused:
@@ -80,85 +191,47 @@ class SpotifyScreen:
                         self.paused = True
                 else:
                     if self.paused and self.current_art_img and self.current_art_img.size == (self.canvas_width, self.canvas_height):
-                        self.title_animation_cnt = 0
-                        self.artist_animation_cnt = 0
-                        self.last_title_reset = math.floor(time.time())
-                        self.last_artist_reset = math.floor(time.time())
+                        self.restartScrolling()
                     self.paused_time = math.floor(time.time())
                     self.paused = False
 
                 if (self.current_title != title or self.current_artist != artist):
                     self.current_artist = artist
                     self.current_title = title
-                    self.title_animation_cnt = 0
-                    self.artist_animation_cnt = 0
-                    self.last_title_reset = math.floor(time.time())
-                    self.last_artist_reset = math.floor(time.time())
+                    self.title_strip = self.renderTextStrip(title)
+                    self.artist_strip = self.renderTextStrip(artist)
+                    self.text_positions = None
 
                 current_time = math.floor(time.time())
                 show_fullscreen = current_time - self.paused_time >= self.paused_delay
 
                 # show fullscreen album art after pause delay
-                if show_fullscreen and self.current_art_img.size == (48, 48):
-                    response = requests.get(self.current_art_url)
-                    img = Image.open(BytesIO(response.content))
-                    self.current_art_img = img.resize((self.canvas_width, self.canvas_height), resample=Image.LANCZOS)
-                elif not show_fullscreen and (self.current_art_url != art_url or self.current_art_img.size == (self.canvas_width, self.canvas_height)):
-                    self.current_art_url = art_url
-                    response = requests.get(self.current_art_url)
-                    img = Image.open(BytesIO(response.content))
-                    self.current_art_img = img.resize((48, 48), resample=Image.LANCZOS)
-
-                frame = Image.new("RGB", (self.canvas_width, self.canvas_height), (0,0,0))
-                draw = ImageDraw.Draw(frame)
+                self.current_art_img = self.resolveArt(art_url, self.canvas_width if show_fullscreen else 48)
 
                 # exit early if fullscreen
-                if self.current_art_img is not None:
-                    if show_fullscreen:
+                if self.current_art_img is not None and show_fullscreen:
+                    if self.fullscreen_frame is None or self.fullscreen_frame[0] is not self.current_art_img:
+                        frame = Image.new("RGB", (self.canvas_width, self.canvas_height), (0,0,0))
                         frame.paste(self.current_art_img, (0,0))
-                        self.current_frame = frame
-                        return (frame, self.is_playing)
-                    else:
-                        frame.paste(self.current_art_img, (8,14))
-
-                freeze_title = self.title_animation_cnt == 0 and self.artist_animation_cnt > 0
-                freeze_artist = self.artist_animation_cnt == 0 and self.title_animation_cnt > 0
-
-                title_len = self.font.getlength(self.current_title)
-                artist_len = self.font.getlength(self.current_artist)
-
-                text_length = self.canvas_width - 12
-                x_offset = 1
-                spacer = "     "
-
-                if title_len > text_length:
-                    draw.text((x_offset-self.title_animation_cnt, 1), self.current_title + spacer + self.current_title, self.title_color, font = self.font)
-                    if current_time - self.last_title_reset >= self.scroll_delay:
-                        self.title_animation_cnt += 1
-                    if freeze_title or self.title_animation_cnt == self.font.getlength(self.current_title + spacer):
-                        self.title_animation_cnt = 0
-                        self.last_title_reset = math.floor(time.time())
-                else:
-                    draw.text((x_offset-self.title_animation_cnt, 1), self.current_title, self.title_color, font = self.font)
-
-                if artist_len > text_length:
-                    draw.text((x_offset-self.artist_animation_cnt, 7), self.current_artist + spacer + self.current_artist, self.artist_color, font = self.font)
-                    if current_time - self.last_artist_reset >= self.scroll_delay:
-                        self.artist_animation_cnt += 1
-                    if freeze_artist or self.artist_animation_cnt == self.font.getlength(self.current_artist + spacer):
-                        self.artist_animation_cnt = 0
-                        self.last_artist_reset = math.floor(time.time())
-                else:
-                    draw.text((x_offset-self.artist_animation_cnt, 7), self.current_artist, self.artist_color, font = self.font)
+                        self.fullscreen_frame = (self.current_art_img, frame)
+                    self.current_frame = self.fullscreen_frame[1]
+                    self.composed_base = None
+                    return (self.current_frame, self.is_playing)
 
-                draw.rectangle((0,0,0,12), fill=(0,0,0))
-                draw.rectangle((52,0,63,12), fill=(0,0,0))
+                # only the scrolling text region is recomposed; everything else comes from the cached base
+                now = time.monotonic()
+                self.syncScrolling(now)
+                base = self.getBaseFrame(self.interpolateProgress(progress_ms, duration_ms, now), duration_ms)
+                positions = (self.stripOffset(self.title_strip, now), self.stripOffset(self.artist_strip, now))
+                if base is self.composed_base and positions == self.text_positions and self.current_frame is not None:
+                    return (self.current_frame, self.is_playing)
+
+                frame = base.copy()
+                self.pasteTextStrip(frame, self.title_strip, 1, self.title_color, now)
+                self.pasteTextStrip(frame, self.artist_strip, 7, self.artist_color, now)
+                self.composed_base = base
+                self.text_positions = positions
 
-                line_y = 63
-                draw.rectangle((0,line_y-1,63,line_y), fill=(100,100,100))
-                draw.rectangle((0,line_y-1,0+round(((progress_ms / duration_ms) * 100) // 1.57), line_y), fill=self.play_color)
-                drawPlayPause(draw, self.is_playing, self.play_color)
-                
                 self.current_frame = frame
                 return (frame, self.is_playing)
         else:
@@ -168,15 +241,94 @@ class SpotifyScreen:
 
             self.current_art_url = ''
             self.is_playing = False
-            self.title_animation_cnt = 0
-            self.artist_animation_cnt = 0
-            self.last_title_reset = math.floor(time.time())
-            self.last_artist_reset = math.floor(time.time())
+            self.restartScrolling()
             self.paused = True
             self.paused_time = math.floor(time.time())
 
             return (self.current_frame, self.is_playing)
 
+    def resolveArt(self, art_url, size):
+        """Art at size once the fetcher has it; until then keep showing the previous art (or a placeholder)"""
+        if art_url == self.current_art_url and self.current_art_img is not None and self.current_art_img.size == (size, size):
+            return self.current_art_img
+
+        art_img = self.art_fetcher.peek(art_url, size)
+        if art_img is not None:
+            self.current_art_url = art_url
+            return art_img
+
+        if self.current_art_img is not None and self.current_art_img.size == (size, size):
+            return self.current_art_img
+        if size not in self.placeholder_art:
+            self.placeholder_art[size] = Image.new("RGB", (size, size), (20,20,20))
+        return self.placeholder_art[size]
+
+    def renderTextStrip(self, text):
+        """Rasterize text once into an 'L' mask; text wider than the window gets a Marquee"""
+        text = text or ''
+        width = math.ceil(self.font.getlength(text))
+        mask_img = Image.new('L', (max(width, 1), self.text_height))
+        ImageDraw.Draw(mask_img).text((0, self.text_pad), text, 255, font = self.font)
+        mask = np.asarray(mask_img)
+
+        marquee = None
+        if width > self.canvas_width - 12:
+            # loop over `text + spacer + text`, pausing scroll_delay seconds at the start of each pass
+            gap = math.ceil(self.font.getlength(text + self.spacer)) - width
+            marquee = Marquee(mask, self.text_window, self.scroll_speed, gap = gap,
+                              delay = self.scroll_delay, loop = False)
+        return (mask, marquee)
+
+    def restartScrolling(self):
+        now = time.monotonic()
+        for strip in (self.title_strip, self.artist_strip):
+            if strip is not None and strip[1] is not None:
+                strip[1].restart(now)
+        self.text_positions = None
+
+    def syncScrolling(self, now):
+        """Title and artist wait for each other, then start their next pass together"""
+        marquees = self.scrollingMarquees()
+        if marquees and all(marquee.finished(now) for marquee in marquees):
+            for marquee in marquees:
+                marquee.restart(now)
+
+    def stripOffset(self, strip, now):
+        if strip is None or strip[1] is None:
+            return 0
+        return int(strip[1].offset(now))
+
+    def pasteTextStrip(self, frame, strip, y, color, now):
+        if strip is None:
+            return
+        mask, marquee = strip
+        window = marquee.window(now) if marquee is not None else mask[:, :self.text_window]
+        frame.paste(color, (self.text_x, y - self.text_pad), Image.fromarray(window))
+
+    def interpolateProgress(self, progress_ms, duration_ms, now):
+        """Advance the last polled progress locally so the bar stays smooth between polls"""
+        if not self.is_playing:
+            return progress_ms
+        return min(duration_ms, progress_ms + (now - self.response_time) * 1000)
+
+    def getBaseFrame(self, progress_ms, duration_ms):
+        """Background with album art, progress bar and play/pause icon, rebuilt only when one changes"""
+        progress_px = round(((progress_ms / duration_ms) * 100) // 1.57)
+        if self.base_key is None or self.base_key[0] is not self.current_art_img or self.base_key[1:] != (self.is_playing, progress_px):
+            frame = Image.new("RGB", (self.canvas_width, self.canvas_height), (0,0,0))
+            draw = ImageDraw.Draw(frame)
+            if self.current_art_img is not None:
+                frame.paste(self.current_art_img, (8,14))
+
+            line_y = 63
+            draw.rectangle((0,line_y-1,63,line_y), fill=(100,100,100))
+            draw.rectangle((0,line_y-1,0+progress_px, line_y), fill=self.play_color)
+            drawPlayPause(draw, self.is_playing, self.play_color)
+
+            self.base_frame = frame
+            self.base_key = (self.current_art_img, self.is_playing, progress_px)
+        return self.base_frame
+
 def drawPlayPause(draw, is_playing, color):
     x = 10
     y = -16
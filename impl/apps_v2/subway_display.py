@@ -1,14 +1,20 @@
 import time, threading, os
+import numpy as np
 from PIL import Image, ImageDraw
-from bdfparser import Font
+from apps_v2.bdf_atlas import GlyphAtlas
+from apps_v2.text_cache import TextRenderCache, blit_rgba
+from apps_v2.compositor import Compositor
+from apps_v2.marquee import Marquee
 
 class SubwayScreen:
     def __init__(self, config, modules):
         self.modules = modules
         self.mta_module = modules.get('mta')
         
-        # Load BDF bitmap font for pixel-perfect rendering (like mta-portal project)
-        self.font = Font("fonts/6x10.bdf")
+        # BDF bitmap font (like mta-portal project), rasterized once into a glyph atlas
+        self.atlas = GlyphAtlas("fonts/6x10.bdf")
+        # Rendered text strips + widths, shared by every draw/measure call in a frame
+        self.text_cache = TextRenderCache(max_entries=64)
         
         # Load pre-rendered circle sprites (like mta-portal uses background images)
         self.circle_sprites = {}
@@ -33,16 +39,32 @@ class SubwayScreen:
         
         # Current arrivals data
         self.current_arrivals = []
+        self._cached_text_for = None
         
-        # Scrolling state for destination text (continuous scrolling)
-        self.scroll_offset = 0
-        self.scroll_speed = 0.5  # Pixels per frame
+        # Layers: static background, per-data-update (sprites/minutes), animated marquee
+        self.compositor = Compositor(self.canvas_width, self.canvas_height, ['static', 'data', 'marquee'])
+        self._board_signature_cache = None
+        self._static_separator = None
+        
+        # Scrolling destination text: time-based marquees over pre-rendered `text + gap + text` strips
+        self.scroll_speed = 6.0  # Pixels per second (independent of frame rate)
+        self.scroll_gap = 20  # Gap between end of text and start of repeated text
+        self.marquee_subpixel = False  # Blend fractional offsets (smoother but softer than the crisp BDF look)
+        self.marquees = {}  # (dest_y, direction) -> Marquee for rows whose destination scrolls
+        self._previous_marquees = {}
+        self._marquee_positions = {}
         self.text_area_width = self.canvas_width - self.text_x  # Available width for text
         
+        # Frame pacing: the board only changes on data updates and marquee steps
+        self.static_fps = 1
+        self.subpixel_fps = 30
+        
         # Data fetching thread
         self.arrivals_data = []
-        self.thread = threading.Thread(target=self._fetch_arrivals_async, daemon=True)
-        self.thread.start()
+        self.polling = threading.Event()  # Cleared while suspended (deep sleep)
+        self.polling.set()
+        self.poll_now = threading.Event()  # Cuts the wait between fetches short
+        self.thread = None  # Started by activate()
     
     def _load_sprites(self):
         """Load pre-rendered circle sprites for each subway line"""
@@ -59,7 +81,7 @@ class SubwayScreen:
                 # Create black background and composite
                 bg = Image.new('RGB', sprite.size, (0, 0, 0))
                 bg.paste(sprite, mask=sprite.split()[3])  # Use alpha as mask
-                self.circle_sprites[line] = bg
+                self.circle_sprites[line] = np.asarray(bg)
                 print(f"[Subway Display] Loaded sprite for line {line}")
         
         print(f"[Subway Display] Loaded {len(self.circle_sprites)} circle sprites")
@@ -68,9 +90,33 @@ class SubwayScreen:
         """Background thread to fetch arrival data"""
         time.sleep(2)  # Initial delay
         while True:
+            self.polling.wait()
+            self.poll_now.clear()
             if self.mta_module:
                 self.arrivals_data = self.mta_module.getArrivals()
-            time.sleep(5)  # Fetch every 5 seconds
+                # Sleep until a feed refresh is due or a shown minute changes
+                self.poll_now.wait(self.mta_module.nextUpdateDelay())
+            else:
+                self.poll_now.wait(5)
+    
+    def activate(self):
+        """Start fetching arrivals (the first call starts the fetch thread)"""
+        if self.thread is None:
+            self.polling.set()
+            self.thread = threading.Thread(target=self._fetch_arrivals_async, daemon=True)
+            self.thread.start()
+        else:
+            self.resume()
+    
+    def suspend(self):
+        """Stop fetching arrivals until resume()"""
+        self.polling.clear()
+    
+    def resume(self):
+        """Fetch again right away if suspended, so the board has fresh arrivals when it is shown"""
+        if not self.polling.is_set():
+            self.polling.set()
+            self.poll_now.set()
     
     def generate(self):
         """Generate a frame for the LED matrix"""
@@ -81,147 +127,178 @@ class SubwayScreen:
         elif self.arrivals_data:
             self.current_arrivals = self.arrivals_data
         
+        if self.current_arrivals is not self._cached_text_for:
+            self._retain_text(self.current_arrivals)
+        
         return self._generate_frame(self.current_arrivals)
     
+    def frameRate(self):
+        """Frames per second this screen wants: one per marquee pixel while text scrolls, else static_fps"""
+        if not self.marquees:
+            return self.static_fps
+        return self.subpixel_fps if self.marquee_subpixel else self.scroll_speed
+    
+    def nextChange(self, now):
+        """Monotonic time of the next marquee step, or None"""
+        steps = [engine.next_step(now) for engine in self.marquees.values() if not engine.subpixel]
+        steps = [step for step in steps if step is not None]
+        return min(steps) if steps else None
+    
+    def _retain_text(self, arrivals):
+        """Evict cached text strips for terminals/minutes no longer on the board"""
+        self._cached_text_for = arrivals
+        wanted = [("Waiting", self.dest_color), ("for data", self.dest_color)]
+        for arrival in arrivals or []:
+            wanted.append((arrival['direction'], self.dest_color))
+            wanted.extend((str(t['minutes']), self.time_color) for t in arrival['times'])
+        self.text_cache.retain(wanted)
+    
     def _generate_frame(self, arrivals):
-        """Render the subway display frame"""
-        frame = Image.new("RGB", (self.canvas_width, self.canvas_height), self.bg_color)
-        draw = ImageDraw.Draw(frame)
+        """Render the subway display frame through the layer compositor"""
+        rows = arrivals[:2] if arrivals else []
+        
+        # Static and per-data layers are only redrawn when what they show changes
+        signature = self._board_signature(rows)
+        if signature != self._board_signature_cache:
+            self._board_signature_cache = signature
+            self._rebuild_board(rows)
+        
+        if self.marquees:
+            # Only the marquee region is re-blitted while long text scrolls
+            self._draw_marquees()
+        
+        return (self.compositor.compose(), bool(arrivals))
+    
+    def _board_signature(self, rows):
+        """Everything the static and data layers depend on"""
+        return tuple(
+            (row['line'], row['direction'], tuple(t['minutes'] for t in row['times']),
+             tuple(row.get('color', ())))
+            for row in rows
+        )
+    
+    def _rebuild_board(self, rows):
+        """Redraw the static background and per-data-update layers"""
+        self._draw_static_layer(show_separator=bool(rows))
+        
+        data = self.compositor['data']
+        data.clear()
+        # Keep scrolling rows whose text didn't change so a minute tick doesn't restart them
+        self._previous_marquees = self.marquees
+        self.marquees = {}
         
-        if not arrivals:
+        if not rows:
             # No arrivals - show waiting message
-            self._draw_bdf_text(frame, 4, 12, "Waiting", self.dest_color)
-            self._draw_bdf_text(frame, 4, 24, "for data", self.dest_color)
-            return (frame, False)
-        
-        # Update scroll offset for long text
-        self._update_scroll(arrivals)
-        
-        # Draw first line (row 1)
-        if len(arrivals) >= 1:
-            self._draw_line_row(draw, frame, arrivals[0], self.row1_y, 0)
-        
-        # Draw dotted separator line between rows
-        self._draw_dotted_line(draw, 32)
-        
-        # Draw second line (row 2)
-        if len(arrivals) >= 2:
-            self._draw_line_row(draw, frame, arrivals[1], self.row2_y, 1)
-        
-        return (frame, True)
-    
-    def _update_scroll(self, arrivals):
-        """Update scroll offset for continuous looping marquee animation"""
-        # Find max text width that needs scrolling
-        max_text_width = 0
-        for arrival in arrivals:
-            text_width = self._get_text_width(arrival['direction'])
-            if text_width > self.text_area_width and text_width > max_text_width:
-                max_text_width = text_width
-        
-        if max_text_width <= self.text_area_width:
-            # No scrolling needed
-            self.scroll_offset = 0
-            return
+            self._draw_bdf_text(data.pixels, 4, 12, "Waiting", self.dest_color)
+            self._draw_bdf_text(data.pixels, 4, 24, "for data", self.dest_color)
+        
+        for row_index, row in enumerate(rows):
+            y_pos = self.row1_y if row_index == 0 else self.row2_y
+            self._draw_line_row(data.pixels, row, y_pos, row_index)
         
-        # Continuous scroll
-        self.scroll_offset += self.scroll_speed
-        
-        # Reset for seamless loop (when first copy has scrolled text_width + gap)
-        gap = 20
-        total_scroll_width = max_text_width + gap
-        if self.scroll_offset >= total_scroll_width:
-            self.scroll_offset = 0  # Seamless reset
-    
-    def _draw_bdf_text(self, image, x, y, text, color, clip_left=None, clip_right=None):
-        """Draw text using BDF bitmap font - pixel perfect rendering"""
-        glyph = self.font.draw(text, missing="?")
-        bitmap = glyph.todata(2)  # Get as 2D array
-        
-        # Default clip boundaries
-        left_bound = clip_left if clip_left is not None else 0
-        right_bound = clip_right if clip_right is not None else self.canvas_width
-        
-        for row_idx, row in enumerate(bitmap):
-            for col_idx, pixel in enumerate(row):
-                if pixel == 1:  # Foreground pixel
-                    px = x + col_idx
-                    py = y + row_idx
-                    # Clip to boundaries
-                    if left_bound <= px < right_bound and 0 <= py < self.canvas_height:
-                        image.putpixel((px, py), color)
-    
-    def _get_text_width(self, text):
+        self._previous_marquees = {}
+        self.compositor['marquee'].clear()
+        self._marquee_positions = {}
+    
+    def _draw_static_layer(self, show_separator):
+        """Background color plus the dotted separator between rows"""
+        if self._static_separator == show_separator:
+            return
+        self._static_separator = show_separator
+        static = self.compositor['static']
+        static.fill(self.bg_color)
+        if show_separator:
+            # Draw dotted separator line between rows
+            self._draw_dotted_line(static.pixels, 32)
+    
+    def _draw_marquees(self):
+        """Copy each marquee's current window into the marquee layer, dirtying only rows that moved"""
+        now = time.monotonic()
+        marquee = self.compositor['marquee']
+        for key, engine in self.marquees.items():
+            position = engine.offset(now)
+            if not engine.subpixel:
+                position = int(position)
+            if self._marquee_positions.get(key) == position:
+                continue
+            self._marquee_positions[key] = position
+            
+            dest_y = key[0]
+            window = engine.window(now)
+            marquee.pixels[dest_y:dest_y + engine.height, self.text_x:self.text_x + engine.window_width] = window
+            marquee.mark_dirty((self.text_x, dest_y, self.text_x + engine.window_width, dest_y + engine.height))
+    
+    def _draw_bdf_text(self, pixels, x, y, text, color, clip_left=None, clip_right=None):
+        """Draw text using BDF bitmap font - pixel perfect rendering from cached strips"""
+        strip = self.text_cache.get(self.atlas, text, color)
+        blit_rgba(pixels, x, y, strip.pixels, clip_left, clip_right)
+    
+    def _get_text_width(self, text, color=None):
         """Get the pixel width of text"""
-        glyph = self.font.draw(text, missing="?")
-        return glyph.width()
+        return self.text_cache.get(self.atlas, text, color or self.dest_color).width
     
-    def _draw_dotted_line(self, draw, y):
+    def _draw_dotted_line(self, pixels, y):
         """Draw a dotted horizontal separator line"""
-        for x in range(0, self.canvas_width, 2):
-            draw.point((x, y), fill=self.separator_color)
+        pixels[y, 0:self.canvas_width:2] = self.separator_color + (255,)
     
-    def _draw_line_row(self, draw, frame, line_data, y_pos, row_index=0):
+    def _get_fallback_circle(self, color):
+        """Rasterize (once per color) a solid circle for lines without sprites (e.g. BART)"""
+        key = ('fallback', color)
+        if key not in self.circle_sprites:
+            circle_size = 19
+            img = Image.new('RGB', (circle_size, circle_size), self.bg_color)
+            r = circle_size // 2
+            ImageDraw.Draw(img).ellipse([0, 0, 2 * r, 2 * r], fill=color)
+            self.circle_sprites[key] = np.asarray(img)
+        return self.circle_sprites[key]
+    
+    def _draw_line_row(self, pixels, line_data, y_pos, row_index=0):
         """Draw a single line's arrival info"""
         line = line_data['line']
         direction = line_data['direction']
         times = line_data['times']
         
         # Paste pre-rendered circle sprite, or draw a colored circle for BART lines
+        sprite_y = y_pos + 6
         if line in self.circle_sprites:
             sprite = self.circle_sprites[line]
-            sprite_y = y_pos + 6
-            frame.paste(sprite, (self.circle_x, sprite_y))
         else:
-            # Draw a solid colored circle for lines without sprites (e.g. BART)
-            circle_size = 19
-            sprite_y = y_pos + 6
-            cx = self.circle_x + circle_size // 2
-            cy = sprite_y + circle_size // 2
-            r = circle_size // 2
-            draw.ellipse(
-                [cx - r, cy - r, cx + r, cy + r],
-                fill=line_data.get('color', (255, 255, 255))
-            )
+            # Solid colored circle for lines without sprites (e.g. BART)
+            sprite = self._get_fallback_circle(tuple(line_data.get('color', (255, 255, 255))))
+        self.compositor['data'].paste(sprite, self.circle_x, sprite_y)
         
         # Draw direction text in cyan/blue (first line of text) - with scrolling if needed
         dest_y = y_pos + 4
         text_width = self._get_text_width(direction)
         
         if text_width > self.text_area_width:
-            # Text is too long - apply looping marquee scroll
-            scroll_x = self.text_x - int(self.scroll_offset)
-            gap = 20  # Gap between end of text and start of repeated text
-            total_scroll_width = text_width + gap
-            
-            # Draw first copy of text
-            self._draw_bdf_text(frame, scroll_x, dest_y, direction, self.dest_color, 
-                               clip_left=self.text_x, clip_right=self.canvas_width)
-            
-            # Draw second copy (looping) that comes in from the right
-            scroll_x2 = scroll_x + total_scroll_width
-            self._draw_bdf_text(frame, scroll_x2, dest_y, direction, self.dest_color,
-                               clip_left=self.text_x, clip_right=self.canvas_width)
+            # Text is too long - looping marquee, rendered once into a strip and scrolled by the clock
+            key = (dest_y, direction)
+            engine = self._previous_marquees.get(key)
+            if engine is None:
+                strip = self.text_cache.get(self.atlas, direction, self.dest_color)
+                engine = Marquee(strip.pixels, self.text_area_width, self.scroll_speed,
+                                 gap=self.scroll_gap, subpixel=self.marquee_subpixel)
+            self.marquees[key] = engine
         else:
             # Text fits - no scrolling needed
-            self._draw_bdf_text(frame, self.text_x, dest_y, direction, self.dest_color)
+            self._draw_bdf_text(pixels, self.text_x, dest_y, direction, self.dest_color)
         
         # Draw times in yellow with subscript dot separators (like reference image)
         times_y = y_pos + 16
-        self._draw_times_with_dots(frame, self.text_x, times_y, times, self.time_color)
+        self._draw_times_with_dots(pixels, self.text_x, times_y, times, self.time_color)
     
-    def _draw_times_with_dots(self, image, x, y, times, color):
+    def _draw_times_with_dots(self, pixels, x, y, times, color):
         """Draw arrival times with small subscript dots as separators (like reference image)"""
         current_x = x
         
         for i, t in enumerate(times):
             # Draw the number
             time_str = str(t['minutes'])
-            self._draw_bdf_text(image, current_x, y, time_str, color)
+            self._draw_bdf_text(pixels, current_x, y, time_str, color)
             
             # Get width of the number we just drew
-            glyph = self.font.draw(time_str)
-            current_x += glyph.width()
+            current_x += self._get_text_width(time_str, color)
             
             # Draw subscript dot separator (except after last number)
             if i < len(times) - 1:
@@ -230,5 +307,5 @@ class SubwayScreen:
                 dot_y = y + 7  # Near bottom of text
                 # Bounds check before drawing
                 if 0 <= dot_x < self.canvas_width and 0 <= dot_y < self.canvas_height:
-                    image.putpixel((dot_x, dot_y), color)
+                    pixels[dot_y, dot_x] = color + (255,)
                 current_x += 4  # Space after dot
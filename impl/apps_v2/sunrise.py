@@ -0,0 +1,52 @@
+import numpy as np
+from PIL import Image
+
+class SunriseRenderer:
+    """Warm sunrise gradient frames, precomputed for quantised progress.
+
+    Every row of the gradient is a single colour, so the whole animation is
+    a (levels + 1, height, 3) lookup table built once per panel size with
+    NumPy. frame() quantises progress to one of the levels and returns the
+    same Image object until the level changes, so the presenter skips the
+    repeats; next_change() says when the next level starts so the loop can
+    sleep until then.
+    """
+
+    def __init__(self, width=64, height=64, levels=256):
+        self.width = width
+        self.height = height
+        self.levels = levels
+        self.lut = self._build_lut()
+        self.level = None
+        self.image = None
+
+    def _build_lut(self):
+        progress = (np.arange(self.levels + 1) / self.levels)[:, None]
+        # Vertical gradient: warmer/brighter at bottom (horizon), cooler at top
+        vert = 1.0 - np.arange(self.height) / self.height  # 1.0 at top, 0.0 at bottom
+        horizon_boost = 1.0 - vert * 0.5  # bottom is brighter
+        intensity = progress * horizon_boost
+        # Blend from deep red (low progress) to bright warm yellow (high progress)
+        r = np.minimum(255, intensity * 255)
+        g = np.minimum(255, intensity * 200 * progress)  # green ramps up for bright yellow
+        b = np.minimum(255, intensity * 40 * progress * progress)  # slight warmth
+        return np.stack([r, g, b], axis=-1).astype(np.uint8)
+
+    def quantise(self, progress):
+        return min(self.levels, max(0, int(progress * self.levels)))
+
+    def frame(self, progress):
+        """Sunrise frame for progress 0.0 (dark) to 1.0 (bright warm)"""
+        level = self.quantise(progress)
+        if level != self.level:
+            rows = self.lut[level]
+            self.image = Image.fromarray(np.repeat(rows[:, None, :], self.width, axis=1))
+            self.level = level
+        return self.image
+
+    def next_change(self, progress, duration):
+        """Seconds until the quantised progress next changes, for a sunrise lasting duration seconds"""
+        level = self.quantise(progress)
+        if level >= self.levels:
+            return None
+        return ((level + 1) / self.levels - progress) * duration
@@ -0,0 +1,78 @@
+from collections import OrderedDict, namedtuple
+import numpy as np
+
+# Pre-rendered RGBA strip (height, width, 4) and its advance width
+TextStrip = namedtuple('TextStrip', ['pixels', 'width'])
+
+class TextRenderCache:
+    """Bounded LRU of rendered text strips keyed by (text, font, colour).
+
+    Steady-state frames only look strips up here; the glyph atlas is consulted
+    on a miss, and entries for text that is no longer shown are dropped with
+    retain() when the underlying data changes.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, atlas, text, color):
+        """Return the TextStrip for text in color, rendering it on a miss"""
+        key = (text, atlas.name, tuple(color))
+        strip = self.entries.get(key)
+        if strip is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return strip
+
+        self.misses += 1
+        mask = atlas.render(text)
+        pixels = np.zeros(mask.shape + (4,), dtype=np.uint8)
+        pixels[mask] = tuple(color) + (255,)
+        pixels.flags.writeable = False
+        strip = TextStrip(pixels, mask.shape[1])
+
+        self.entries[key] = strip
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return strip
+
+    def retain(self, wanted):
+        """Evict every entry whose (text, color) pair is not in wanted"""
+        wanted = {(text, tuple(color)) for text, color in wanted}
+        for key in [k for k in self.entries if (k[0], k[2]) not in wanted]:
+            del self.entries[key]
+            self.evictions += 1
+
+    def stats(self):
+        """Hit/miss counters for logging"""
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def blit_rgba(buf, x, y, pixels, clip_left=None, clip_right=None):
+    """Copy the opaque pixels of an RGBA strip onto an RGB or RGBA buffer, clipping by slicing"""
+    buf_height, buf_width = buf.shape[:2]
+    strip_height, strip_width = pixels.shape[:2]
+
+    left = max(x, clip_left if clip_left is not None else 0, 0)
+    right = min(x + strip_width, clip_right if clip_right is not None else buf_width, buf_width)
+    top = max(y, 0)
+    bottom = min(y + strip_height, buf_height)
+    if left >= right or top >= bottom:
+        return
+
+    window = pixels[top - y:bottom - y, left - x:right - x]
+    opaque = window[..., 3] != 0
+    buf[top:bottom, left:right][opaque] = window[..., :buf.shape[2]][opaque]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark: album art decode + resize, full-size decode vs smallest adequate image + JPEG draft mode.
+
+Synthetic JPEGs stand in for Spotify's 640/300/64px album images unless
+--art points at a real file. Peak memory is reported as the size of the
+decoded working image, which dominates the decode: Pillow keeps RGB at
+4 bytes per pixel, and its buffers are invisible to tracemalloc.
+
+Run from the impl/ directory:
+    python benchmarks/bench_art_decode.py [--runs N] [--art path/to/640.jpg]
+"""
+
+import os, sys, time, argparse
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules.art_cache import decode_art
+
+SIZES = (48, 64)
+
+
+def make_jpeg(size, seed=1):
+    """A photo-like test image: smooth gradients plus noise, JPEG q=85"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    base = np.stack([x * 255, y * 255, (1 - x) * y * 255], axis=2)
+    pixels = np.clip(base + rng.normal(0, 25, base.shape), 0, 255).astype(np.uint8)
+    buf = BytesIO()
+    Image.fromarray(pixels).save(buf, 'JPEG', quality=85)
+    return buf.getvalue()
+
+
+def decode_full(data):
+    """The previous path: decode at full resolution, LANCZOS to each size"""
+    img = Image.open(BytesIO(data))
+    return {size: img.resize((size, size), resample=Image.LANCZOS) for size in SIZES}
+
+
+def decode_reduced(data):
+    return decode_art(data, SIZES)
+
+
+def time_decode(fn, data, runs):
+    fn(data)
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(data)
+    return (time.perf_counter() - start) / runs
+
+
+def working_image_kib(data, draft):
+    """Size of the decoded pixel buffer the resize works from"""
+    img = Image.open(BytesIO(data))
+    if draft:
+        img.draft('RGB', (max(SIZES), max(SIZES)))
+    width, height = img.size
+    return width * height * 4 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Album art decode+resize: full vs reduced')
+    parser.add_argument('--runs', type=int, default=50, help='decodes per variant')
+    parser.add_argument('--art', help='a real 640x640 album art JPEG to use instead of synthetic images')
+    args = parser.parse_args()
+
+    if args.art:
+        with open(args.art, 'rb') as f:
+            large = f.read()
+        img = Image.open(BytesIO(large)).convert('RGB')
+        medium, small = BytesIO(), BytesIO()
+        img.resize((300, 300), resample=Image.LANCZOS).save(medium, 'JPEG', quality=85)
+        img.resize((64, 64), resample=Image.LANCZOS).save(small, 'JPEG', quality=85)
+        medium, small = medium.getvalue(), small.getvalue()
+    else:
+        large, medium, small = make_jpeg(640), make_jpeg(300), make_jpeg(64)
+
+    variants = [
+        ('640px full decode (before)', decode_full, large, False),
+        ('640px draft decode', decode_reduced, large, True),
+        ('300px draft decode', decode_reduced, medium, True),
+        ('64px image (after)', decode_reduced, small, True),
+    ]
+
+    print(f"{'variant':30} {'ms/decode':>10} {'decoded KiB':>12}")
+    for name, fn, data, draft in variants:
+        ms = time_decode(fn, data, args.runs) * 1000
+        print(f"{name:30} {ms:10.2f} {working_image_kib(data, draft):12.1f}")
+
+
+if __name__ == '__main__':
+    main()
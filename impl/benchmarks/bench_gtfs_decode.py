@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Benchmark: GTFS-realtime decode + index, nyct-gtfs full parse vs the streaming stop-filtered decoder.
+
+Runs on recorded feeds (raw protobuf payloads, e.g. the *.pb files the MTA
+module keeps in .gtfs_cache/) or on a synthetic feed of --trips trips.
+Memory is the tracemalloc peak of one decode, i.e. the transient Python
+objects that drive GC pauses on the render thread; GC collections are
+counted per decode as well.
+
+Run from the impl/ directory:
+    python benchmarks/bench_gtfs_decode.py [--runs N] [--stops A27N,A27S] [feed.pb ...]
+"""
+
+import os, sys, gc, time, argparse, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nyct_gtfs import NYCTFeed
+from modules.gtfs_feeds import FeedFetcher
+from gtfs_fixtures import make_feed, station_ids
+
+FEED_URL = "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fgtfs-ace"
+
+
+def time_decode(parse, data, runs):
+    parse(FEED_URL, data)
+    collections = sum(stat['collections'] for stat in gc.get_stats())
+    start = time.perf_counter()
+    for _ in range(runs):
+        parse(FEED_URL, data)
+    elapsed = (time.perf_counter() - start) / runs
+    collections = sum(stat['collections'] for stat in gc.get_stats()) - collections
+    return elapsed, collections / runs
+
+
+def peak_kib(parse, data):
+    gc.collect()
+    tracemalloc.start()
+    parse(FEED_URL, data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GTFS-RT decode: nyct-gtfs vs streaming')
+    parser.add_argument('feeds', nargs='*', help='recorded GTFS-RT payloads (default: synthetic ACE-sized feed)')
+    parser.add_argument('--runs', type=int, default=10, help='decodes per variant')
+    parser.add_argument('--trips', type=int, default=300, help='trips in the synthetic feed')
+    parser.add_argument('--stops', default='A27N,A27S', help='configured stop_id+direction list')
+    args = parser.parse_args()
+
+    if args.feeds:
+        payloads = []
+        for path in args.feeds:
+            with open(path, 'rb') as f:
+                payloads.append((os.path.basename(path), f.read()))
+    else:
+        payloads = [('synthetic ACE', make_feed(list('ACE'), station_ids('AH'), trips=args.trips))]
+
+    stop_ids = [stop.strip() for stop in args.stops.split(',') if stop.strip()]
+    variants = [
+        ('nyct-gtfs', FeedFetcher(NYCTFeed, cache_dir=None)),
+        ('streaming', FeedFetcher(NYCTFeed, cache_dir=None, stop_ids=stop_ids)),
+    ]
+
+    print(f"{'feed':24} {'variant':10} {'KiB':>8} {'ms/decode':>10} {'peak KiB':>9} {'GCs/decode':>11} {'arrivals':>9}")
+    for name, data in payloads:
+        for variant, fetcher in variants:
+            index = fetcher._parse(FEED_URL, data)
+            found = sum(len(index.arrivals(stop)) for stop in stop_ids)
+            elapsed, collections = time_decode(fetcher._parse, data, args.runs)
+            peak = peak_kib(fetcher._parse, data)
+            print(f"{name[:24]:24} {variant:10} {len(data) / 1024:8.0f} {elapsed * 1000:10.1f} {peak:9.0f} "
+                  f"{collections:11.2f} {found:9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Benchmark: MTAModule.getArrivals against the local fixture server.
+
+Each scenario configures many lanes, stops and lines, then forces a full
+refresh repeatedly while the server publishes a new snapshot every
+--publish-every refreshes (the rest are 304s / unchanged snapshots).
+Reports refresh latency, HTTP request latency, parse time, cache hit rate,
+the cost of a cached read, and the tracemalloc peak of a refresh that
+parses new snapshots. Parse time is wall time on the fetch workers, so it
+includes contention between feeds parsed concurrently.
+
+Run from the impl/ directory:
+    python benchmarks/bench_mta_module.py [--scenarios small,medium,large] [--refreshes 20]
+        [--latency-ms 50] [--error-rate 0.0] [--decoder stream|nyct] [--trips 300]
+"""
+
+import os, io, sys, time, argparse, tempfile, contextlib, configparser, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from modules.mta_module import MTAModule
+from gtfs_fixtures import FEEDS, station_ids
+from gtfs_fixture_server import FixtureServer
+
+# name -> (lanes, stops per lane, distinct feeds)
+SCENARIOS = {
+    'small': (2, 1, 1),
+    'medium': (4, 2, 3),
+    'large': (12, 3, 8),
+}
+
+FEED_ORDER = ['nyct%2Fgtfs-nqrw', 'nyct%2Fgtfs-l', 'nyct%2Fgtfs-ace', 'nyct%2Fgtfs-bdfm',
+              'nyct%2Fgtfs', 'nyct%2Fgtfs-g', 'nyct%2Fgtfs-jz', 'nyct%2Fgtfs-si']
+
+
+def make_config(lanes, stops_per_lane, feeds, base_url, cache_dir, decoder):
+    config = configparser.ConfigParser()
+    config['MTA'] = {'feed_base_url': base_url, 'feed_cache_dir': cache_dir, 'decoder': decoder}
+    for n in range(lanes):
+        feed = FEED_ORDER[n % feeds]
+        lines, prefixes = FEEDS[feed]
+        stations = station_ids(prefixes)
+        step = max(1, len(stations) // (stops_per_lane + 1))
+        first = (n * 3) % step
+        stops = stations[first::step][:stops_per_lane]
+        config[f'SubwayLane{n + 1}'] = {
+            'stop_ids': ','.join(stops),
+            'direction': 'NS'[n % 2],
+            'lines': 'SI' if lines == 'SI' else ','.join(lines),
+        }
+    return config
+
+
+def force_refresh(module):
+    for state in module.scheduler.feeds.values():
+        state['next_due'] = 0
+        state['errors'] = 0
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_scenario(name, server, args):
+    lanes, stops_per_lane, feeds = SCENARIOS[name]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        config = make_config(lanes, stops_per_lane, feeds, server.base_url, cache_dir, args.decoder)
+        quiet = io.StringIO()
+        with contextlib.redirect_stdout(quiet):
+            module = MTAModule(config)
+
+            refresh_times = []
+            for n in range(args.refreshes):
+                if n and n % args.publish_every == 0:
+                    server.publish()
+                force_refresh(module)
+                started = time.perf_counter()
+                module.getArrivals()
+                refresh_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for _ in range(100):
+                result = module._get_cached_with_updated_times()
+            read_time = (time.perf_counter() - started) / 100
+
+            server.publish()
+            force_refresh(module)
+            tracemalloc.start()
+            module.getArrivals()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    stats = module.feed_fetcher.stats()
+    decoded = stats['parses'] + stats['parses_skipped']
+    return {
+        'scenario': name,
+        'lanes': lanes,
+        'stops': lanes * stops_per_lane,
+        'feeds': len(module.scheduler.feeds),
+        'refresh_p50_ms': percentile(refresh_times, 0.5) * 1000,
+        'refresh_p95_ms': percentile(refresh_times, 0.95) * 1000,
+        'request_ms': stats['request_seconds'] / max(1, stats['requests']) * 1000,
+        'parse_ms': stats['parse_seconds'] / max(1, stats['parses']) * 1000,
+        'hit_rate': stats['parses_skipped'] / max(1, decoded),
+        'read_us': read_time * 1e6,
+        'peak_kib': peak / 1024,
+        'lanes_shown': len(result or []),
+        'kib_downloaded': stats['bytes_downloaded'] / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MTAModule load benchmark against the fixture server')
+    parser.add_argument('--scenarios', default='small,medium,large', help=f"comma list of {', '.join(SCENARIOS)}")
+    parser.add_argument('--refreshes', type=int, default=20, help='forced refreshes per scenario')
+    parser.add_argument('--publish-every', type=int, default=4, help='refreshes between new snapshots')
+    parser.add_argument('--latency-ms', type=float, default=50, help='server latency per request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests failing with HTTP 500')
+    parser.add_argument('--decoder', default='stream', choices=['stream', 'nyct'])
+    parser.add_argument('--trips', type=int, default=300, help='trips per synthetic feed')
+    args = parser.parse_args()
+
+    server = FixtureServer(latency=args.latency_ms / 1000, error_rate=args.error_rate, trips=args.trips).start()
+    try:
+        print(f"{'scenario':8} {'lanes':>5} {'stops':>5} {'feeds':>5} {'p50 ms':>8} {'p95 ms':>8} {'req ms':>7} "
+              f"{'parse ms':>8} {'hits':>5} {'read us':>8} {'peak KiB':>9} {'KiB down':>9}")
+        for name in args.scenarios.split(','):
+            r = run_scenario(name.strip(), server, args)
+            print(f"{r['scenario']:8} {r['lanes']:5} {r['stops']:5} {r['feeds']:5} {r['refresh_p50_ms']:8.1f} "
+                  f"{r['refresh_p95_ms']:8.1f} {r['request_ms']:7.1f} {r['parse_ms']:8.1f} {r['hit_rate']:5.0%} "
+                  f"{r['read_us']:8.1f} {r['peak_kib']:9.0f} {r['kib_downloaded']:9.0f}")
+        print(f"server: {server.stats()}")
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
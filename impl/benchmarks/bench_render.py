@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Benchmark: the render pipeline (controller_v3.DisplayLoop) without a matrix.
+
+SpotifyScreen and SubwayScreen run headless against a no-op matrix and are
+fed recorded playback, album art and arrival snapshots (render_fixtures.py)
+on a virtual clock: the frame scheduler sleeps by advancing it, and each
+frame's real render time is added too, so deadlines and misses behave as
+on the device while a 30-minute sunrise replays in a second. Pollers are
+simulated at their real cadence, so lazy activation and idle checks show
+up in the poll counts.
+
+Per scenario it reports frames rendered/presented/skipped, missed
+deadlines, per-frame latency p50/p95/p99, CPU time per second of display,
+the tracemalloc peak per frame (from a second, traced run) and gen-0 GCs
+per frame. --json writes the same numbers for diffing between releases.
+
+Run from the impl/ directory:
+    python benchmarks/bench_render.py [--scenarios scrolling_titles,...] [--json results.json]
+        [--fixtures DIR] [--save-fixtures DIR]
+"""
+
+import os, io, gc, sys, json, time, argparse, platform, tempfile, contextlib, configparser, tracemalloc
+from datetime import datetime
+from queue import LifoQueue
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from apps_v2 import spotify_player, subway_display, marquee
+from apps_v2.frame_presenter import FramePresenter
+from apps_v2.frame_scheduler import FrameScheduler
+from modules.schedule_state import ScheduleState
+from controller_v3 import DisplayLoop
+from render_fixtures import ART_URL, make_fixtures, save_fixtures, load_fixtures
+
+# name -> mode, seconds of display, Spotify playback as (start s, track index or None for idle, playing)
+SCENARIOS = {
+    'scrolling_titles': {'mode': 'spotify', 'seconds': 60, 'playback': [(0, 0, True)]},
+    'track_changes': {'mode': 'spotify', 'seconds': 60,
+                      'playback': [(0, 1, True), (10, 2, True), (20, 3, True), (30, 4, True), (40, 0, True),
+                                   (50, 1, False)]},
+    'fullscreen_art': {'mode': 'spotify', 'fullscreen': True, 'seconds': 60, 'playback': [(0, 1, True), (30, 2, True)]},
+    'subway_board': {'mode': 'subway', 'seconds': 300},
+    'sunrise': {'mode': 'subway', 'seconds': 1830, 'sunrise': True},
+    'mode_fallback': {'mode': 'auto', 'seconds': 120, 'playback': [(0, 0, True), (30, None, False), (90, 1, True)]},
+}
+
+# Virtual start: the sunrise scenario's schedule wakes at 07:00
+START = datetime(2026, 1, 5, 6, 30).timestamp()
+
+# SpotifyModule.poll_interval_playing / _paused / _idle, and MTAModule's base refresh interval
+SPOTIFY_POLL_PLAYING = 5
+SPOTIFY_POLL_IDLE = 15
+SUBWAY_POLL = 30
+
+
+class VirtualClock:
+    """Stands in for the time module in the render path; only moves when advanced"""
+
+    def __init__(self, start):
+        self.now = start
+        self.offset = start - 1000.0  # monotonic() starts at 1000
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now - self.offset
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class NullCanvas:
+    def SetImage(self, image, offset_x=0, offset_y=0, unsafe=True):
+        pass
+
+
+class NullMatrix:
+    """CreateFrameCanvas/SwapOnVSync of rpi-rgb-led-matrix, doing nothing"""
+
+    def CreateFrameCanvas(self):
+        return NullCanvas()
+
+    def SwapOnVSync(self, canvas):
+        return canvas
+
+
+class BenchModule:
+    """The queue side of SpotifyModule / MTAModule; the bench fills it"""
+
+    def __init__(self):
+        self.queue = LifoQueue()
+
+
+class HeadlessPolling:
+    """Replaces an app's poller thread: the bench delivers data whenever a poll is due"""
+    bench_clock = None
+    activated = False
+    next_poll = 0.0
+    polls = 0
+
+    def activate(self):
+        if not self.activated:
+            self.activated = True
+            self.polling.set()
+            self.next_poll = self.bench_clock.time()
+        else:
+            self.resume()
+
+    def resume(self):
+        if not self.polling.is_set():
+            self.polling.set()
+            self.next_poll = self.bench_clock.time()
+
+    def poll_due(self, now):
+        return self.activated and self.polling.is_set() and now >= self.next_poll
+
+
+class BenchSpotifyScreen(HeadlessPolling, spotify_player.SpotifyScreen):
+    pass
+
+
+class BenchSubwayScreen(HeadlessPolling, subway_display.SubwayScreen):
+    pass
+
+
+def spotify_response(scenario, fixtures, t):
+    """What SpotifyModule.getCurrentPlayback() would have queued t seconds in"""
+    start, track_index, playing = [segment for segment in scenario['playback'] if segment[0] <= t][-1]
+    if track_index is None:
+        return None
+    track = fixtures['tracks'][track_index]
+    progress_ms = int((t - start) * 1000) % track['duration_ms'] if playing else 0
+    return (track['artist'], track['title'], ART_URL.format(track['art']), playing, progress_ms,
+            track['duration_ms'])
+
+
+def deliver(apps, scenario, fixtures, now):
+    """Run the simulated pollers that are due"""
+    t = now - START
+    for app in apps:
+        if not app.poll_due(now):
+            continue
+        app.polls += 1
+        if isinstance(app, BenchSpotifyScreen):
+            response = spotify_response(scenario, fixtures, t)
+            app.spotify_module.queue.put(response)
+            interval = SPOTIFY_POLL_PLAYING if response is not None and response[3] else SPOTIFY_POLL_IDLE
+            if app.idle_check:
+                interval = app.idle_check_interval
+        else:
+            snapshots = fixtures['arrivals']
+            app.mta_module.queue.put(snapshots[int(t // SUBWAY_POLL) % len(snapshots)])
+            interval = SUBWAY_POLL
+        app.next_poll = now + interval
+
+
+def build_apps(scenario, fixtures, clock, tmp):
+    config = configparser.ConfigParser()
+    config['Spotify'] = {'art_cache_dir': os.path.join(tmp, 'art')}
+    apps = []
+    if scenario['mode'] in ('spotify', 'auto'):
+        spotify_app = BenchSpotifyScreen(config, {'spotify': BenchModule()}, scenario.get('fullscreen', False))
+        # Recorded art goes into the disk cache and is decoded up front, as after a prefetch
+        cache = spotify_app.art_cache
+        for name, data in fixtures['art'].items():
+            url = ART_URL.format(name)
+            with open(cache._path(url), 'wb') as f:
+                f.write(data)
+            for size in cache.sizes:
+                cache.get(url, size)
+        apps.append(spotify_app)
+    if scenario['mode'] in ('subway', 'auto'):
+        apps.append(BenchSubwayScreen(config, {'mta': BenchModule()}))
+    for app in apps:
+        app.bench_clock = clock
+    return apps
+
+
+def run_scenario(name, fixtures, trace=False):
+    """Replay one scenario; returns per-frame samples and counters"""
+    scenario = SCENARIOS[name]
+    clock = VirtualClock(START)
+    for module in (spotify_player, subway_display, marquee):
+        module.time = clock
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        schedule_path = os.path.join(tmp, '.schedule')
+        if scenario.get('sunrise'):
+            with open(schedule_path, 'w') as f:
+                json.dump({'enabled': True, 'off_time': '23:00', 'on_time': '07:00'}, f)
+
+        apps = build_apps(scenario, fixtures, clock, tmp)
+        presenter = FramePresenter(NullMatrix())
+        scheduler = FrameScheduler(clock=clock.monotonic, sleep=clock.sleep, log_interval=float('inf'))
+        schedule = ScheduleState(schedule_path, clock=clock.time)
+        loop = DisplayLoop(scenario['mode'], apps, presenter, scheduler, schedule, clock=clock)
+
+        latencies, cpu, peaks, collections = [], 0.0, [], 0
+        if trace:
+            gc.collect()
+            tracemalloc.start()
+        end = START + scenario['seconds']
+        while clock.time() < end:
+            deliver(apps, scenario, fixtures, clock.time())
+            if trace:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            gen0 = gc.get_stats()[0]['collections']
+            cpu_started = time.process_time()
+            started = time.perf_counter()
+            fps, next_change = loop.step()
+            elapsed = time.perf_counter() - started
+            cpu += time.process_time() - cpu_started
+            collections += gc.get_stats()[0]['collections'] - gen0
+            if trace:
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            latencies.append(elapsed)
+            clock.sleep(elapsed)  # Render time counts against the next deadline
+            scheduler.wait(fps, next_change)
+        if trace:
+            tracemalloc.stop()
+
+    return {
+        'latencies': latencies,
+        'cpu': cpu,
+        'peaks': peaks,
+        'collections': collections,
+        'presenter': presenter.stats(),
+        'scheduler': scheduler.stats(),
+        'polls': {type(app).__name__.replace('Bench', ''): app.polls for app in apps},
+    }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def measure(name, fixtures):
+    timed = run_scenario(name, fixtures)
+    traced = run_scenario(name, fixtures, trace=True)
+    frames = len(timed['latencies'])
+    seconds = SCENARIOS[name]['seconds']
+    return {
+        'scenario': name,
+        'seconds': seconds,
+        'frames': frames,
+        'presented': timed['presenter']['presented'],
+        'skipped': timed['presenter']['skipped'],
+        'missed': timed['scheduler']['missed'],
+        'p50_ms': percentile(timed['latencies'], 0.5) * 1000,
+        'p95_ms': percentile(timed['latencies'], 0.95) * 1000,
+        'p99_ms': percentile(timed['latencies'], 0.99) * 1000,
+        'cpu_ms_per_s': timed['cpu'] * 1000 / seconds,
+        'alloc_kib_per_frame': sum(traced['peaks']) / max(1, len(traced['peaks'])) / 1024,
+        'alloc_p95_kib': percentile(traced['peaks'], 0.95) / 1024 if traced['peaks'] else 0,
+        'gc_per_frame': timed['collections'] / max(1, frames),
+        'polls': timed['polls'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless render pipeline benchmark')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"comma list of {', '.join(SCENARIOS)}")
+    parser.add_argument('--fixtures', help='directory of recorded fixtures (default: built-in set)')
+    parser.add_argument('--save-fixtures', help='write the fixtures used to this directory and exit')
+    parser.add_argument('--json', help="write results as JSON to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else make_fixtures()
+    if args.save_fixtures:
+        save_fixtures(fixtures, args.save_fixtures)
+        print(f"Wrote fixtures to {args.save_fixtures}")
+        return
+
+    results = [measure(name.strip(), fixtures) for name in args.scenarios.split(',')]
+
+    if args.json:
+        report = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'fixtures': args.fixtures or 'built-in',
+            'scenarios': results,
+        }
+        if args.json == '-':
+            print(json.dumps(report, indent=1))
+            return
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=1)
+
+    print(f"{'scenario':17} {'frames':>6} {'shown':>6} {'skip':>6} {'miss':>4} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'p99 ms':>7} {'cpu ms/s':>8} {'KiB/frm':>7} {'GC/frm':>6}  polls")
+    for r in results:
+        polls = ' '.join(f"{app}={count}" for app, count in r['polls'].items())
+        print(f"{r['scenario']:17} {r['frames']:6} {r['presented']:6} {r['skipped']:6} {r['missed']:4} "
+              f"{r['p50_ms']:7.3f} {r['p95_ms']:7.3f} {r['p99_ms']:7.3f} {r['cpu_ms_per_s']:8.2f} "
+              f"{r['alloc_kib_per_frame']:7.1f} {r['gc_per_frame']:6.3f}  {polls}")
+
+
+if __name__ == '__main__':
+    main()
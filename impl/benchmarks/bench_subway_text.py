@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-frame BDF text cost of the subway board, putpixel vs glyph atlas vs cached strips.
+
+Run from the impl/ directory:
+    python benchmarks/bench_subway_text.py [--frames N]
+"""
+
+import os, sys, time, argparse
+import numpy as np
+from PIL import Image
+from bdfparser import Font
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from apps_v2.bdf_atlas import GlyphAtlas
+from apps_v2.text_cache import TextRenderCache, blit_rgba
+
+CANVAS = 64
+TEXT_X = 22
+DEST_COLOR = (100, 180, 255)
+TIME_COLOR = (255, 200, 50)
+
+# Text drawn on a typical two-row frame: one scrolling destination (two copies), one static
+# destination and two rows of arrival minutes
+FRAME_TEXT = [
+    (TEXT_X - 7, 4, "Astoria-Ditmars Blvd", DEST_COLOR, TEXT_X, CANVAS),
+    (TEXT_X - 7 + 140, 4, "Astoria-Ditmars Blvd", DEST_COLOR, TEXT_X, CANVAS),
+    (TEXT_X, 16, "3", TIME_COLOR, None, None),
+    (TEXT_X + 10, 16, "12", TIME_COLOR, None, None),
+    (TEXT_X + 26, 16, "25", TIME_COLOR, None, None),
+    (TEXT_X, 37, "Mhtn", DEST_COLOR, None, None),
+    (TEXT_X, 49, "0", TIME_COLOR, None, None),
+    (TEXT_X + 10, 49, "7", TIME_COLOR, None, None),
+]
+
+
+def draw_text_putpixel(font, image, x, y, text, color, clip_left=None, clip_right=None):
+    """The previous SubwayScreen._draw_bdf_text: bdfparser draw + putpixel per pixel"""
+    bitmap = font.draw(text, missing="?").todata(2)
+    left_bound = clip_left if clip_left is not None else 0
+    right_bound = clip_right if clip_right is not None else CANVAS
+    for row_idx, row in enumerate(bitmap):
+        for col_idx, pixel in enumerate(row):
+            if pixel == 1:
+                px = x + col_idx
+                py = y + row_idx
+                if left_bound <= px < right_bound and 0 <= py < CANVAS:
+                    image.putpixel((px, py), color)
+
+
+def frame_putpixel(font):
+    image = Image.new("RGB", (CANVAS, CANVAS))
+    for args in FRAME_TEXT:
+        draw_text_putpixel(font, image, *args)
+        font.draw(args[2], missing="?").width()  # the width lookup that accompanied every draw
+    return image
+
+
+def blit_mask(buf, x, y, mask, color, clip_left=None, clip_right=None):
+    """Set every True pixel of mask to color, clipping by array slicing (uncached atlas drawing)"""
+    buf_height, buf_width = buf.shape[:2]
+    mask_height, mask_width = mask.shape[:2]
+
+    left = max(x, clip_left if clip_left is not None else 0, 0)
+    right = min(x + mask_width, clip_right if clip_right is not None else buf_width, buf_width)
+    top = max(y, 0)
+    bottom = min(y + mask_height, buf_height)
+    if left >= right or top >= bottom:
+        return
+
+    window = mask[top - y:bottom - y, left - x:right - x]
+    buf[top:bottom, left:right][window] = color
+
+
+def frame_atlas(atlas):
+    frame = np.zeros((CANVAS, CANVAS, 3), dtype=np.uint8)
+    for x, y, text, color, clip_left, clip_right in FRAME_TEXT:
+        mask = atlas.render(text)
+        blit_mask(frame, x, y, mask, color, clip_left, clip_right)
+    return Image.fromarray(frame)
+
+
+def frame_cached(state):
+    atlas, cache = state
+    frame = np.zeros((CANVAS, CANVAS, 3), dtype=np.uint8)
+    for x, y, text, color, clip_left, clip_right in FRAME_TEXT:
+        strip = cache.get(atlas, text, color)
+        blit_rgba(frame, x, y, strip.pixels, clip_left, clip_right)
+    return Image.fromarray(frame)
+
+
+def bench(fn, arg, frames):
+    fn(arg)  # warm up
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn(arg)
+    return (time.perf_counter() - start) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-frame subway text cost before/after the glyph atlas')
+    parser.add_argument('--frames', type=int, default=500, help='frames to render per variant')
+    parser.add_argument('--font', default='fonts/6x10.bdf', help='BDF font path')
+    args = parser.parse_args()
+
+    font = Font(args.font)
+    start = time.perf_counter()
+    atlas = GlyphAtlas(args.font)
+    atlas_build = time.perf_counter() - start
+
+    if not (np.asarray(frame_putpixel(font)) == np.asarray(frame_atlas(atlas))).all():
+        print("WARNING: atlas output differs from putpixel output")
+
+    cache = TextRenderCache()
+    before = bench(frame_putpixel, font, args.frames)
+    after = bench(frame_atlas, atlas, args.frames)
+    cached = bench(frame_cached, (atlas, cache), args.frames)
+
+    print(f"atlas build (one-off):  {atlas_build * 1000:8.2f} ms")
+    print(f"putpixel per frame:     {before * 1000:8.3f} ms")
+    print(f"atlas per frame:        {after * 1000:8.3f} ms")
+    print(f"cached strips per frame:{cached * 1000:8.3f} ms  {cache.stats()}")
+    print(f"speedup (atlas):        {before / after:8.1f}x")
+    print(f"speedup (cached):       {before / cached:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
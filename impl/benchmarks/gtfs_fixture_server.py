@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Local stand-in for the MTA GTFS-realtime endpoints.
+
+Serves recorded snapshots (raw protobuf payloads, e.g. the *.pb files in
+.gtfs_cache/ or files named after the feed path such as nyct%2Fgtfs-ace.pb)
+or synthetic feeds, with configurable latency and error injection. ETag /
+If-None-Match is supported, so the MTA module's conditional requests and
+unchanged-snapshot handling can be exercised too.
+
+Point the display at it with:
+    [MTA]
+    feed_base_url = http://127.0.0.1:8765/
+
+Run from the impl/ directory:
+    python benchmarks/gtfs_fixture_server.py [--port 8765] [--latency-ms 80] [--error-rate 0.05]
+        [--trips 300] [--publish-every 30] [recorded_dir]
+"""
+
+import os, sys, json, time, random, hashlib, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gtfs_fixtures import make_feeds
+
+
+def load_recorded(directory):
+    """{feed path: payload} from a directory of recorded snapshots"""
+    feeds = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.pb'):
+            continue
+        path = os.path.join(directory, name)
+        feed_path = name[:-3]
+        try:
+            # .gtfs_cache stores <sha1>.pb next to <sha1>.json holding the feed URL
+            with open(path[:-3] + '.json') as f:
+                feed_path = json.load(f)['url'].rstrip('/').rsplit('/', 1)[-1]
+        except (OSError, ValueError, KeyError):
+            pass
+        with open(path, 'rb') as f:
+            feeds[quote(unquote(feed_path), safe='')] = f.read()
+    return feeds
+
+
+class FixtureServer:
+    """Threaded HTTP server answering GET /<feed path> with the current snapshot.
+
+    latency: seconds added to every response (plus up to jitter seconds)
+    error_rate: fraction of requests answered with HTTP 500
+    publish_every: with synthetic feeds, seconds between new snapshots (0 = never)
+    """
+
+    def __init__(self, feeds=None, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 trips=200, publish_every=0, seed=0):
+        self.synthetic = feeds is None
+        self.trips = trips
+        self.publish_every = publish_every
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+
+        self.published_at = time.time()
+        self._set_feeds(feeds if feeds is not None else make_feeds(trips=trips, now=self.published_at, seed=seed))
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def publish(self, now=None):
+        """Replace every synthetic feed with a new snapshot (new header timestamp)"""
+        self.published_at = time.time() if now is None else now
+        self.seed += 1
+        self._set_feeds(make_feeds(trips=self.trips, now=self.published_at, seed=self.seed))
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'not_modified': self.not_modified,
+            'bytes_sent': self.bytes_sent,
+        }
+
+    def _set_feeds(self, feeds):
+        with self.lock:
+            self.feeds = {path: (data, '"%s"' % hashlib.sha1(data).hexdigest()[:16]) for path, data in feeds.items()}
+
+    def _handle(self, handler):
+        if self.synthetic and self.publish_every:
+            with self.lock:
+                due = time.time() - self.published_at >= self.publish_every
+                if due:
+                    self.published_at = time.time()
+            if due:
+                self.publish(self.published_at)
+
+        with self.lock:
+            self.requests += 1
+            fail = self.rng.random() < self.error_rate
+            delay = self.latency + self.rng.random() * self.jitter
+            entry = self.feeds.get(quote(unquote(handler.path.lstrip('/')), safe=''))
+        if delay:
+            time.sleep(delay)
+
+        if fail:
+            with self.lock:
+                self.errors += 1
+            handler.send_response(500)
+            handler.end_headers()
+            return
+        if entry is None:
+            handler.send_response(404)
+            handler.end_headers()
+            return
+
+        data, etag = entry
+        if handler.headers.get('If-None-Match') == etag:
+            with self.lock:
+                self.not_modified += 1
+            handler.send_response(304)
+            handler.send_header('ETag', etag)
+            handler.end_headers()
+            return
+
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'application/octet-stream')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.send_header('ETag', etag)
+        handler.end_headers()
+        handler.wfile.write(data)
+        with self.lock:
+            self.bytes_sent += len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local GTFS-realtime fixture server')
+    parser.add_argument('recorded', nargs='?', help='directory of recorded *.pb snapshots (default: synthetic feeds)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0, help='added to every response')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='random extra latency up to this')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with HTTP 500')
+    parser.add_argument('--trips', type=int, default=300, help='trips per synthetic feed')
+    parser.add_argument('--publish-every', type=float, default=30, help='seconds between synthetic snapshots')
+    args = parser.parse_args()
+
+    feeds = load_recorded(args.recorded) if args.recorded else None
+    server = FixtureServer(feeds, host=args.host, port=args.port, latency=args.latency_ms / 1000,
+                           jitter=args.jitter_ms / 1000, error_rate=args.error_rate, trips=args.trips,
+                           publish_every=args.publish_every)
+    print(f"[Fixture Server] Serving {len(server.feeds)} feeds at {server.base_url}")
+    for path, (data, _) in server.feeds.items():
+        print(f"  {path}: {len(data) / 1024:.0f} KiB")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"[Fixture Server] {server.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Synthetic NYCT GTFS-realtime feeds for benchmarks.
+
+Feeds are built from the real station list shipped with nyct-gtfs, so stop
+IDs, terminal names and the nyct_subway extensions look like the MTA's own
+feeds; only the trips and times are made up.
+"""
+
+import os, csv, time, random
+import nyct_gtfs
+from nyct_gtfs.compiled_gtfs import gtfs_realtime_pb2, nyct_subway_pb2
+
+# Feed path -> (lines it carries, stop_id prefixes of its stations)
+FEEDS = {
+    'nyct%2Fgtfs': ('1234567', '1234569'),
+    'nyct%2Fgtfs-ace': ('ACE', 'AH'),
+    'nyct%2Fgtfs-bdfm': ('BDFM', 'BDF'),
+    'nyct%2Fgtfs-g': ('G', 'G'),
+    'nyct%2Fgtfs-jz': ('JZ', 'JM'),
+    'nyct%2Fgtfs-nqrw': ('NQRW', 'RNQ'),
+    'nyct%2Fgtfs-l': ('L', 'L'),
+    'nyct%2Fgtfs-si': ('SI', 'S'),
+}
+
+
+def station_ids(prefixes):
+    """Parent station IDs from nyct-gtfs's stops.txt whose ID starts with one of prefixes"""
+    path = os.path.join(os.path.dirname(nyct_gtfs.__file__), 'gtfs_static', 'stops.txt')
+    with open(path, newline='') as f:
+        return sorted(row['stop_id'] for row in csv.DictReader(f)
+                      if row['location_type'] == '1' and row['stop_id'][0] in prefixes)
+
+
+def make_feed(lines, stations, trips=200, now=None, seed=0):
+    """Serialized FeedMessage with `trips` underway trips over segments of stations"""
+    rng = random.Random(seed)
+    now = int(time.time()) if now is None else int(now)
+    message = gtfs_realtime_pb2.FeedMessage()
+    message.header.gtfs_realtime_version = '1.0'
+    message.header.timestamp = now
+    message.header.Extensions[nyct_subway_pb2.nyct_feed_header].nyct_subway_version = '1.0'
+
+    for i in range(trips):
+        line = rng.choice(lines)
+        direction = rng.choice('NS')
+        length = rng.randint(min(10, len(stations)), min(40, len(stations)))
+        first = rng.randint(0, len(stations) - length)
+        stops = stations[first:first + length]
+        if direction == 'S':
+            stops = stops[::-1]
+
+        trip = gtfs_realtime_pb2.TripDescriptor()
+        trip.trip_id = f"{(i * 37) % 144000:06d}_{line}..{direction}{rng.randint(1, 99):02d}R"
+        trip.route_id = line
+        trip.start_date = time.strftime('%Y%m%d', time.localtime(now))
+        descriptor = trip.Extensions[nyct_subway_pb2.nyct_trip_descriptor]
+        descriptor.train_id = f"0{line} {i:04d}+ {stops[0]}/{stops[-1]}"
+        descriptor.is_assigned = True
+        descriptor.direction = 1 if direction == 'N' else 3
+
+        entity = message.entity.add()
+        entity.id = f"{i * 2 + 1:06d}"
+        entity.trip_update.trip.CopyFrom(trip)
+        arrival = now + rng.randint(-60, 900)
+        for stop in stops:
+            update = entity.trip_update.stop_time_update.add()
+            update.stop_id = stop + direction
+            update.arrival.time = arrival
+            update.departure.time = arrival + 30
+            update.Extensions[nyct_subway_pb2.nyct_stop_time_update].scheduled_track = '1'
+            update.Extensions[nyct_subway_pb2.nyct_stop_time_update].actual_track = '1'
+            arrival += rng.randint(60, 180)
+
+        entity = message.entity.add()
+        entity.id = f"{i * 2 + 2:06d}"
+        entity.vehicle.trip.CopyFrom(trip)
+        entity.vehicle.current_stop_sequence = 1
+        entity.vehicle.stop_id = stops[0] + direction
+        entity.vehicle.timestamp = now - rng.randint(0, 90)
+
+    return message.SerializeToString()
+
+
+def make_feeds(trips=200, now=None, seed=0):
+    """{feed path: serialized feed} for every NYCT subway feed"""
+    feeds = {}
+    for n, (path, (lines, prefixes)) in enumerate(FEEDS.items()):
+        line_ids = ['SI'] if lines == 'SI' else list(lines)
+        feeds[path] = make_feed(line_ids, station_ids(prefixes), trips=trips, now=now, seed=seed + n)
+    return feeds
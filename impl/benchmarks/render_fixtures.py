@@ -0,0 +1,82 @@
+"""Recorded inputs for the render benchmark: Spotify playback, album art and subway arrival snapshots.
+
+make_fixtures() builds a deterministic set; save_fixtures() / load_fixtures()
+write and read it as files, so a set can be frozen alongside a release (or
+replaced by real captures in the same layout) and replayed identically:
+
+    tracks.json     [{"artist", "title", "art", "duration_ms"}, ...]
+    arrivals.json   [[row, row], ...]  rows as MTAModule.getArrivals() returns them
+    art/<art>.jpg   album art, served to SpotifyScreen as https://i.scdn.co/image/<art>
+"""
+
+import os, json
+
+from bench_art_decode import make_jpeg
+
+ART_URL = 'https://i.scdn.co/image/{}'
+
+TRACKS = [
+    # Titles/artists wider than the 51px text window scroll
+    {'artist': 'Godspeed You! Black Emperor', 'title': 'Sleep (Including Monheim / Broken Windows, Locks of Love)',
+     'art': 'gybe', 'duration_ms': 712000},
+    {'artist': 'Low', 'title': 'Words', 'art': 'low', 'duration_ms': 214000},
+    {'artist': 'The Avalanches', 'title': 'Since I Left You', 'art': 'avalanches', 'duration_ms': 261000},
+    {'artist': 'Björk', 'title': 'Jóga', 'art': 'bjork', 'duration_ms': 305000},
+    {'artist': 'Neutral Milk Hotel', 'title': 'In the Aeroplane Over the Sea', 'art': 'nmh', 'duration_ms': 202000},
+]
+
+LINE_COLORS = {'Q': (252, 204, 10), 'L': (167, 169, 172)}
+
+# (line, destination, first arrival in minutes) per board row; the Q's destination scrolls
+BOARD = [('Q', 'Coney Island-Stillwell Av', 2), ('L', 'Mhtn', 4)]
+
+
+def make_arrivals(snapshots=10, spacing=30):
+    """Board snapshots taken every spacing seconds, trains counting down and rolling off"""
+    result = []
+    for n in range(snapshots):
+        rows = []
+        for line, destination, first in BOARD:
+            minutes = [(first + 6 * k - n * spacing // 60) % 20 for k in range(3)]
+            rows.append({
+                'line': line,
+                'direction': destination,
+                'times': [{'minutes': m, 'arrival_timestamp': 0, 'terminal': destination} for m in sorted(minutes)],
+                'color': LINE_COLORS[line],
+            })
+        result.append(rows)
+    return result
+
+
+def make_fixtures():
+    return {
+        'tracks': [dict(track) for track in TRACKS],
+        'arrivals': make_arrivals(),
+        'art': {track['art']: make_jpeg(300, seed=n) for n, track in enumerate(TRACKS)},
+    }
+
+
+def save_fixtures(fixtures, directory):
+    os.makedirs(os.path.join(directory, 'art'), exist_ok=True)
+    with open(os.path.join(directory, 'tracks.json'), 'w') as f:
+        json.dump(fixtures['tracks'], f, indent=1, ensure_ascii=False)
+    with open(os.path.join(directory, 'arrivals.json'), 'w') as f:
+        json.dump(fixtures['arrivals'], f)
+    for name, data in fixtures['art'].items():
+        with open(os.path.join(directory, 'art', name + '.jpg'), 'wb') as f:
+            f.write(data)
+
+
+def load_fixtures(directory):
+    with open(os.path.join(directory, 'tracks.json')) as f:
+        tracks = json.load(f)
+    with open(os.path.join(directory, 'arrivals.json')) as f:
+        arrivals = json.load(f)
+    for rows in arrivals:
+        for row in rows:
+            row['color'] = tuple(row['color'])
+    art = {}
+    for track in tracks:
+        with open(os.path.join(directory, 'art', track['art'] + '.jpg'), 'rb') as f:
+            art[track['art']] = f.read()
+    return {'tracks': tracks, 'arrivals': arrivals, 'art': art}
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Compile a static GTFS stops.txt into the memory-mapped stop index (stop_index.bin).
+
+The index maps every station and platform stop_id to its name, parent
+station, borough and a short display name. The MTA module uses it for
+terminal names and the webapp uses it to validate stop IDs. If the file is
+missing it is built from nyct-gtfs's bundled stops.txt on first use, so
+this script is only needed for a newer stops.txt or exact boroughs.
+
+Boroughs come from the MTA's Stations.csv when given, otherwise they are
+derived from station coordinates.
+
+Usage (from the impl/ directory):
+    python build_stop_index.py [path/to/stops.txt] [--stations Stations.csv] [-o stop_index.bin]
+"""
+
+import os, argparse
+from modules.stop_index import DEFAULT_INDEX_PATH, StopIndex, build_index, default_stops_txt, read_boroughs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile GTFS stops.txt into the stop index')
+    parser.add_argument('stops_txt', nargs='?', help="GTFS stops.txt (default: nyct-gtfs's bundled copy)")
+    parser.add_argument('--stations', help="MTA Stations.csv with a Borough column")
+    parser.add_argument('-o', '--output', default=DEFAULT_INDEX_PATH, help='index file to write')
+    args = parser.parse_args()
+
+    stops_txt = args.stops_txt or default_stops_txt()
+    boroughs = read_boroughs(args.stations) if args.stations else None
+    data = build_index(stops_txt, boroughs)
+    with open(args.output + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(args.output + '.tmp', args.output)
+
+    index = StopIndex.open(args.output)
+    print(f"Wrote {args.output}: {len(index)} stops, {len(data) / 1024:.0f} KiB (from {stops_txt})")
+
+
+if __name__ == '__main__':
+    main()
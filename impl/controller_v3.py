@@ -1,83 +1,223 @@
-import os, inspect, sys, math, time, json, configparser, argparse, warnings
-from datetime import datetime, timedelta
+import os, inspect, sys, math, time, select, signal, configparser, argparse, warnings
 from PIL import Image
 
 from apps_v2 import spotify_player
 from apps_v2 import subway_display
+from apps_v2.frame_scheduler import FrameScheduler
+from apps_v2.frame_presenter import FramePresenter
+from apps_v2.sunrise import SunriseRenderer
 from modules import spotify_module
 from modules import mta_module
+from modules import transit_client
+from modules.schedule_state import ScheduleState
 
 
 SCHEDULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.schedule')
 
-SUNRISE_DURATION_MINUTES = 30
+# Warm the data pollers this many seconds before the sunrise ends deep sleep
+DEEP_SLEEP_WARM_UP = 60
 
-def _read_schedule():
-    """Read and parse the schedule file. Returns dict or None."""
-    if not os.path.exists(SCHEDULE_PATH):
-        return None
-    try:
-        with open(SCHEDULE_PATH, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return None
-
-def is_schedule_sleeping():
-    """Check if the display should be off based on the schedule file."""
-    schedule = _read_schedule()
-    if not schedule or not schedule.get('enabled', False):
-        return False
-    now = datetime.now().time()
-    off_time = datetime.strptime(schedule['off_time'], '%H:%M').time()
-    on_time = datetime.strptime(schedule['on_time'], '%H:%M').time()
-    # Sunrise starts 30 min before on_time — not sleeping during sunrise
-    sunrise_start = (datetime.combine(datetime.today(), on_time) - timedelta(minutes=SUNRISE_DURATION_MINUTES)).time()
-    # If off_time > on_time, sleep window crosses midnight (e.g. 23:00 - 07:00)
-    if off_time > on_time:
-        sleeping = now >= off_time or now < on_time
-    else:
-        sleeping = off_time <= now < on_time
-    if sleeping and get_sunrise_progress() > 0:
-        return False  # In sunrise window, not sleeping
-    return sleeping
-
-def get_sunrise_progress():
-    """Return sunrise progress 0.0-1.0 if within 30 min before wake time, else 0."""
-    schedule = _read_schedule()
-    if not schedule or not schedule.get('enabled', False):
-        return 0.0
-    now = datetime.now()
-    on_time = datetime.strptime(schedule['on_time'], '%H:%M').time()
-    wake_dt = datetime.combine(now.date(), on_time)
-    sunrise_start_dt = wake_dt - timedelta(minutes=SUNRISE_DURATION_MINUTES)
-    # Handle midnight crossing: if sunrise_start is tomorrow relative to now
-    if now.time() > on_time and on_time < datetime.strptime(schedule.get('off_time', '23:00'), '%H:%M').time():
-        wake_dt += timedelta(days=1)
-        sunrise_start_dt = wake_dt - timedelta(minutes=SUNRISE_DURATION_MINUTES)
-    if sunrise_start_dt <= now < wake_dt:
-        elapsed = (now - sunrise_start_dt).total_seconds()
-        total = SUNRISE_DURATION_MINUTES * 60
-        return min(1.0, elapsed / total)
-    return 0.0
-
-def generate_sunrise_frame(progress, width=64, height=64):
-    """Generate a warm sunrise gradient frame. Progress 0.0 (dark) to 1.0 (bright warm)."""
-    img = Image.new("RGB", (width, height))
-    pixels = img.load()
-    # Color stops: deep red -> orange -> amber -> warm yellow
-    # At low progress, very dim deep red. At full progress, bright warm light.
-    for y in range(height):
-        # Vertical gradient: warmer/brighter at bottom (horizon), cooler at top
-        vert = 1.0 - (y / height)  # 1.0 at top, 0.0 at bottom
-        horizon_boost = 1.0 - vert * 0.5  # bottom is brighter
-        intensity = progress * horizon_boost
-        # Blend from deep red (low progress) to bright warm yellow (high progress)
-        r = int(min(255, intensity * 255))
-        g = int(min(255, intensity * 200 * progress))  # green ramps up for bright yellow
-        b = int(min(255, intensity * 40 * progress * progress))  # slight warmth
-        for x in range(width):
-            pixels[x, y] = (r, g, b)
-    return img
+class WakeSignal:
+    """SIGUSR1 from the webapp, delivered through a self-pipe.
+
+    install() has the interpreter's C-level handler write the signal number
+    to the pipe (signal.set_wakeup_fd), so nothing takes a lock in signal
+    context; wait() selects on the read end with a timeout.
+    """
+
+    def __init__(self, signum=signal.SIGUSR1):
+        self.signum = signum
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        os.set_blocking(self.write_fd, False)
+
+    def install(self):
+        """Route the signal to the pipe; call from the main thread"""
+        signal.set_wakeup_fd(self.write_fd, warn_on_full_buffer=False)
+        signal.signal(self.signum, lambda signum, frame: None)  # The wakeup fd needs a Python-level handler
+
+    def clear(self):
+        self._drain()
+
+    def wait(self, timeout=None):
+        """True if the signal arrived within timeout seconds (other signals sharing the fd are ignored)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.read_fd], [], [], remaining)
+            if readable and self.signum in self._drain():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def _drain(self):
+        received = b''
+        try:
+            while True:
+                chunk = os.read(self.read_fd, 512)
+                if not chunk:
+                    break
+                received += chunk
+        except BlockingIOError:
+            pass
+        return received
+
+
+def deep_sleep(schedule, presenter, black_screen, apps, wake):
+    """Blank the panel once and idle until the sunrise starts, suspending the apps' pollers.
+
+    The webapp sends SIGUSR1 (delivered through wake) after changing the schedule,
+    so an edited or disabled schedule takes effect immediately. Pollers are
+    resumed DEEP_SLEEP_WARM_UP seconds before waking so the first frames
+    have fresh data.
+    """
+    wake.clear()
+    presenter.present(black_screen)
+    for app in apps:
+        app.suspend()
+    print(f"[Controller] Deep sleep until {time.strftime('%H:%M', time.localtime(schedule.next_transition()))}")
+
+    resumed = False
+    while schedule.is_sleeping():
+        now = time.time()
+        wake_at = schedule.next_transition(now)
+        if not resumed and wake_at - now <= DEEP_SLEEP_WARM_UP:
+            for app in apps:
+                app.resume()
+            resumed = True
+        # Re-check at least every few minutes in case the clock was adjusted
+        timeout = wake_at - now - (0 if resumed else DEEP_SLEEP_WARM_UP)
+        if wake.wait(timeout=min(300, max(0.1, timeout))):
+            wake.clear()
+            schedule.reload()
+
+    if not resumed:
+        for app in apps:
+            app.resume()
+    print("[Controller] Waking up")
+
+
+class DisplayLoop:
+    """The render loop: picks the frame to show, presents it and paces the next one.
+
+    apps is [app], or [spotify_app, subway_app] in auto mode, where the
+    subway board takes over after auto_fallback_delay seconds without
+    playback. The shutdown delay, sleep schedule and sunrise apply on top.
+    step() renders and presents one frame without waiting, which is what
+    the render benchmark drives; clock supplies time() and monotonic().
+    """
+
+    def __init__(self, mode, apps, presenter, scheduler, schedule, width=64, height=64, shutdown_delay=15,
+                 clock=time):
+        self.mode = mode
+        self.apps = apps
+        self.presenter = presenter
+        self.scheduler = scheduler
+        self.schedule = schedule
+        self.sunrise = SunriseRenderer(width, height)
+        self.black_screen = Image.new("RGB", (width, height), (0,0,0))
+        self.shutdown_delay = shutdown_delay
+        self.clock = clock
+        self.wake = WakeSignal()  # SIGUSR1 from the webapp, once main() installs it
+        self.idle_fps = 1  # Black screen and sunrise
+        self.last_active_time = math.floor(clock.time())
+
+        # Auto mode: grace period before switching to subway (avoids flicker on brief pauses)
+        self.auto_fallback_delay = 10  # seconds of no spotify activity before showing subway
+        self.subway_warm_delay = self.auto_fallback_delay / 2  # start fetching arrivals this early so the board is ready
+        self.spotify_inactive_since = None
+        self.showing_subway = False
+
+        # Pollers start on activation; in auto mode the subway board is only activated when needed
+        apps[0].activate()
+
+    def run(self):
+        while True:
+            if self.schedule.is_sleeping():
+                deep_sleep(self.schedule, self.presenter, self.black_screen, self.apps, self.wake)
+                self.scheduler.reset()
+                continue
+            self.scheduler.wait(*self.step())
+
+    def step(self):
+        """Render and present one frame; returns the (fps, next_change) to wait for the next one with"""
+        if self.mode == 'auto':
+            frame, is_active, shown_app = self.generate_auto()
+        else:
+            shown_app = self.apps[0]
+            frame, is_active = shown_app.generate()
+
+        current_time = math.floor(self.clock.time())
+
+        if frame is not None:
+            if is_active:
+                self.last_active_time = current_time
+            elif current_time - self.last_active_time >= self.shutdown_delay:
+                frame = self.black_screen
+                shown_app = None
+        else:
+            frame = self.black_screen
+            shown_app = None
+
+        sunrise_progress = self.schedule.sunrise_progress()
+        if sunrise_progress > 0:
+            frame = self.sunrise.frame(sunrise_progress)
+
+        self.presenter.present(frame)
+
+        if sunrise_progress > 0:
+            # The sunrise image only changes when its quantised progress does
+            step = self.sunrise.next_change(sunrise_progress, self.schedule.sunrise_seconds)
+            if step is None:
+                return self.idle_fps, None
+            return 1 / max(step, 0.001), self.clock.monotonic() + step
+        if shown_app is not None:
+            return shown_app.frameRate(), shown_app.nextChange(self.clock.monotonic())
+        return self.idle_fps, None
+
+    def generate_auto(self):
+        """Spotify while it plays, the subway board once it has been idle for auto_fallback_delay"""
+        spotify_app, subway_app = self.apps
+
+        # While the board is up spotify is only checked for playback, not rendered
+        if self.showing_subway:
+            spotify_frame, spotify_active = None, spotify_app.isActive()
+        else:
+            spotify_frame, spotify_active = spotify_app.generate()
+
+        # Track how long spotify has been inactive
+        now = math.floor(self.clock.time())
+        if spotify_active:
+            self.spotify_inactive_since = None
+        elif self.spotify_inactive_since is None:
+            self.spotify_inactive_since = now
+        inactive_for = 0 if self.spotify_inactive_since is None else now - self.spotify_inactive_since
+
+        # The subway board warms up partway into the grace period and goes dormant while music plays
+        if spotify_active:
+            subway_app.suspend()
+        elif inactive_for >= self.subway_warm_delay:
+            subway_app.activate()
+
+        # Use subway fallback if spotify has been inactive long enough
+        use_subway = inactive_for >= self.auto_fallback_delay
+        if use_subway != self.showing_subway:
+            self.showing_subway = use_subway
+            spotify_app.setIdleCheck(use_subway)
+
+        if use_subway:
+            frame, is_active = subway_app.generate()
+            return frame, is_active, subway_app
+        if spotify_frame is None:
+            spotify_frame, spotify_active = spotify_app.generate()
+        return spotify_frame, spotify_active, spotify_app
+
+
+def make_transit_module(config):
+    """Local MTA polling, or a client of the shared transit service if [MTA] service_address is set."""
+    if config.get('MTA', 'service_address', fallback=''):
+        return transit_client.TransitClient(config)
+    return mta_module.MTAModule(config)
 
 
 def main():
@@ -118,19 +258,20 @@ def main():
     # Initialize modules and app based on mode
     if mode == 'subway':
         print("Starting in TRANSIT mode...")
-        transit_mod = mta_module.MTAModule(config)
+        transit_mod = make_transit_module(config)
         modules = { 'mta': transit_mod }
         app = subway_display.SubwayScreen(config, modules)
     elif mode == 'auto':
         print("Starting in AUTO mode (spotify with transit fallback)...")
         spotify_mod = spotify_module.SpotifyModule(config)
-        transit_mod = mta_module.MTAModule(config)
+        transit_mod = make_transit_module(config)
         spotify_app = spotify_player.SpotifyScreen(config, { 'spotify': spotify_mod }, is_full_screen_always)
         subway_app = subway_display.SubwayScreen(config, { 'mta': transit_mod })
     else:
         print("Starting in SPOTIFY mode...")
         modules = { 'spotify': spotify_module.SpotifyModule(config) }
         app = spotify_player.SpotifyScreen(config, modules, is_full_screen_always)
+    apps = [spotify_app, subway_app] if mode == 'auto' else [app]
 
     # setup matrix
     options = RGBMatrixOptions()
@@ -142,56 +283,19 @@ def main():
     options.limit_refresh_rate_hz = config.getint('Matrix', 'limit_refresh_rate_hz', fallback=0)
     options.drop_privileges = False
     matrix = RGBMatrix(options = options)
+    # Double-buffered output that skips frames already on the panel
+    presenter = FramePresenter(matrix)
 
-    shutdown_delay = config.getint('Matrix', 'shutdown_delay', fallback=15)
-    black_screen = Image.new("RGB", (canvas_width, canvas_height), (0,0,0))
-    last_active_time = math.floor(time.time())
-
-    # Auto mode: grace period before switching to subway (avoids flicker on brief pauses)
-    auto_fallback_delay = 10  # seconds of no spotify activity before showing subway
-    spotify_inactive_since = None
-
-    # generate image
-    while(True):
-        if mode == 'auto':
-            spotify_frame, spotify_active = spotify_app.generate()
-
-            # Track how long spotify has been inactive
-            if spotify_active:
-                spotify_inactive_since = None
-            elif spotify_inactive_since is None:
-                spotify_inactive_since = math.floor(time.time())
-
-            # Use subway fallback if spotify has been inactive long enough
-            use_subway = (spotify_inactive_since is not None and
-                          math.floor(time.time()) - spotify_inactive_since >= auto_fallback_delay)
-
-            if use_subway:
-                frame, is_active = subway_app.generate()
-            else:
-                frame, is_active = spotify_frame, spotify_active
-        else:
-            frame, is_active = app.generate()
-
-        current_time = math.floor(time.time())
-
-        if frame is not None:
-            if is_active:
-                last_active_time = math.floor(time.time())
-            elif current_time - last_active_time >= shutdown_delay:
-                frame = black_screen
-        else:
-            frame = black_screen
-
-        sunrise_progress = get_sunrise_progress()
-        if sunrise_progress > 0:
-            frame = generate_sunrise_frame(sunrise_progress, canvas_width, canvas_height)
-        elif is_schedule_sleeping():
-            frame = black_screen
-
-        matrix.SetImage(frame)
-        time.sleep(0.08)
+    # Frames are paced by the shown app's declared rate and next-change hint
+    scheduler = FrameScheduler(max_fps=config.getint('Matrix', 'max_fps', fallback=30))
+    # Sleep schedule from the webapp, re-read only when the file changes
+    schedule = ScheduleState(SCHEDULE_PATH)
 
+    loop = DisplayLoop(mode, apps, presenter, scheduler, schedule, canvas_width, canvas_height,
+                       shutdown_delay=config.getint('Matrix', 'shutdown_delay', fallback=15))
+    # The webapp signals schedule changes so a sleeping display re-reads it at once
+    loop.wake.install()
+    loop.run()
 
 if __name__ == '__main__':
     try:
@@ -0,0 +1,251 @@
+import os, hashlib, itertools, threading, time, requests
+from collections import OrderedDict
+from queue import PriorityQueue
+from io import BytesIO
+from PIL import Image
+
+class AlbumArtCache:
+    """Album art keyed by URL: an in-memory LRU of decoded, pre-resized variants
+    backed by a size-bounded on-disk cache of the raw downloads.
+
+    Every requested size is produced when an image is decoded, so switching
+    between the 48px and 64px layouts never hits the network.
+    """
+
+    def __init__(self, cache_dir='.art_cache', max_disk_bytes=20 * 1024 * 1024, max_entries=16, sizes=(48, 64)):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_entries = max_entries
+        self.sizes = sizes
+        self.entries = OrderedDict()  # url -> {size: Image}
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0  # Decoded entries dropped from the memory LRU
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"[Art Cache] Disk cache disabled: {e}")
+            self.cache_dir = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build from the optional art_cache_* keys of the [Spotify] section"""
+        if config is not None and 'Spotify' in config:
+            cache_dir = config.get('Spotify', 'art_cache_dir', fallback='.art_cache')
+            max_mb = config.getint('Spotify', 'art_cache_mb', fallback=20)
+            return cls(cache_dir, max_disk_bytes=max_mb * 1024 * 1024)
+        return cls()
+
+    def __contains__(self, url):
+        with self.lock:
+            return url in self.entries
+
+    def peek(self, url, size):
+        """Return the variant if it is already decoded in memory, else None (never does I/O)"""
+        with self.lock:
+            variants = self.entries.get(url)
+            if variants is None or size not in variants:
+                return None
+            self.memory_hits += 1
+            self.entries.move_to_end(url)
+            return variants[size]
+
+    def get(self, url, size):
+        """Return the size x size variant of the art at url, loading it if needed"""
+        with self.lock:
+            variants = self.entries.get(url)
+            if variants is not None:
+                self.memory_hits += 1
+                self.entries.move_to_end(url)
+
+        if variants is None:
+            variants = self._load_variants(url)
+        if size not in variants:
+            # Unusual size - derive it from the largest variant we have
+            largest = variants[max(variants)]
+            variants = dict(variants)
+            variants[size] = largest.resize((size, size), resample=Image.LANCZOS)
+
+        with self.lock:
+            self.entries[url] = variants
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return variants[size]
+
+    def stats(self):
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+        }
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def _load_variants(self, url):
+        """Decoded variants from the disk cache, or downloaded (and stored) on a miss.
+
+        A cached file that no longer decodes (truncated or corrupt) is evicted
+        and the art downloaded again; a download that doesn't decode isn't kept.
+        """
+        data = self._read(url)
+        if data is not None:
+            try:
+                return self._decode(data)
+            except Exception as e:
+                print(f"[Art Cache] Discarding undecodable cached art for {url}: {e}")
+                self._evict(url)
+
+        self.misses += 1
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        data = response.content
+        self._store(url, data)
+        try:
+            return self._decode(data)
+        except Exception:
+            self._evict(url)
+            raise
+
+    def _read(self, url):
+        """Raw image bytes from the disk cache, or None"""
+        if self.cache_dir is None:
+            return None
+        path = self._path(url)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Most recently used
+        except OSError:
+            return None
+        self.disk_hits += 1
+        return data
+
+    def _evict(self, url):
+        """Forget url in memory and on disk"""
+        with self.lock:
+            self.entries.pop(url, None)
+        if self.cache_dir is not None:
+            try:
+                os.remove(self._path(url))
+            except OSError:
+                pass
+
+    def _decode(self, data):
+        return decode_art(data, self.sizes)
+
+    def _store(self, url, data):
+        if self.cache_dir is None:
+            return
+        path = self._path(url)
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+            self._prune()
+        except OSError as e:
+            print(f"[Art Cache] Could not write {path}: {e}")
+
+    def _prune(self):
+        """Delete least recently used files until the cache fits in max_disk_bytes"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class AlbumArtFetcher:
+    """Loads album art into an AlbumArtCache on a background thread.
+
+    The render loop only ever peeks at the cache; art for the current track
+    is fetched ahead of prefetches (e.g. the next track in the queue), and a
+    failed URL is not retried for retry_delay seconds.
+    """
+
+    CURRENT = 0
+    PREFETCH = 1
+
+    def __init__(self, cache, sizes=(48, 64), retry_delay=30):
+        self.cache = cache
+        self.sizes = sizes
+        self.retry_delay = retry_delay
+        self.pending = PriorityQueue()
+        self.requested = set()
+        self.failed = {}  # url -> time it may be retried
+        self.lock = threading.Lock()
+        self.counter = itertools.count()
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def peek(self, url, size):
+        """Decoded art if ready; otherwise queue the download and return None"""
+        if not url:
+            return None
+        img = self.cache.peek(url, size)
+        if img is None:
+            self.request(url, self.CURRENT)
+        return img
+
+    def prefetch(self, url):
+        """Warm the cache for art that is likely to be shown soon"""
+        if url and url not in self.cache:
+            self.request(url, self.PREFETCH)
+
+    def request(self, url, priority):
+        with self.lock:
+            if url in self.requested or time.time() < self.failed.get(url, 0):
+                return
+            self.requested.add(url)
+        self.pending.put((priority, next(self.counter), url))
+
+    def _run(self):
+        while True:
+            _, _, url = self.pending.get()
+            try:
+                for size in self.sizes:
+                    self.cache.get(url, size)
+                with self.lock:
+                    self.failed.pop(url, None)
+            except Exception as e:
+                print(f"[Art Cache] Failed to fetch {url}: {e}")
+                with self.lock:
+                    self.failed[url] = time.time() + self.retry_delay
+            finally:
+                with self.lock:
+                    self.requested.discard(url)
+
+
+def decode_art(data, sizes):
+    """Decode image bytes into {size: size x size RGB Image}.
+
+    JPEGs are decoded in draft mode at the smallest DCT scale (1/2, 1/4 or
+    1/8) that still covers the largest wanted size, then resampled with LANCZOS.
+    """
+    largest = max(sizes)
+    img = Image.open(BytesIO(data))
+    img.draft('RGB', (largest, largest))
+    img = img.convert('RGB')
+    return {size: img.resize((size, size), resample=Image.LANCZOS) for size in sizes}
@@ -0,0 +1,503 @@
+import os, json, time, hashlib, itertools, threading, requests
+from concurrent.futures import ThreadPoolExecutor
+
+MTA_FEED_BASE = "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/"
+
+# Subway line -> GTFS-realtime feed path (several lines share one feed)
+LINE_FEEDS = {
+    '1': 'nyct%2Fgtfs', '2': 'nyct%2Fgtfs', '3': 'nyct%2Fgtfs', '4': 'nyct%2Fgtfs',
+    '5': 'nyct%2Fgtfs', '6': 'nyct%2Fgtfs', '7': 'nyct%2Fgtfs', 'S': 'nyct%2Fgtfs', 'GS': 'nyct%2Fgtfs',
+    'A': 'nyct%2Fgtfs-ace', 'C': 'nyct%2Fgtfs-ace', 'E': 'nyct%2Fgtfs-ace', 'H': 'nyct%2Fgtfs-ace',
+    'SR': 'nyct%2Fgtfs-ace',
+    'B': 'nyct%2Fgtfs-bdfm', 'D': 'nyct%2Fgtfs-bdfm', 'F': 'nyct%2Fgtfs-bdfm', 'M': 'nyct%2Fgtfs-bdfm',
+    'FS': 'nyct%2Fgtfs-bdfm', 'SF': 'nyct%2Fgtfs-bdfm',
+    'G': 'nyct%2Fgtfs-g',
+    'J': 'nyct%2Fgtfs-jz', 'Z': 'nyct%2Fgtfs-jz',
+    'N': 'nyct%2Fgtfs-nqrw', 'Q': 'nyct%2Fgtfs-nqrw', 'R': 'nyct%2Fgtfs-nqrw', 'W': 'nyct%2Fgtfs-nqrw',
+    'L': 'nyct%2Fgtfs-l',
+    'SI': 'nyct%2Fgtfs-si', 'SIR': 'nyct%2Fgtfs-si',
+}
+
+class ArrivalIndex:
+    """Upcoming arrivals of one parsed feed, keyed by stop_id+direction (e.g. "R20N").
+
+    Built with a single pass over the feed's underway trips; each key holds
+    (arrival_ts, line, terminal) tuples sorted by time, so any lane or stop
+    query is a dictionary lookup plus a slice. terminal is the stop_id of the
+    trip's last stop; names are looked up in the stop index when shown.
+    """
+
+    def __init__(self, entries):
+        self.arrivals_by_stop = {}
+        for stop_id, arrivals in entries.items():
+            arrivals.sort(key=lambda arrival: arrival[0])
+            self.arrivals_by_stop[stop_id] = arrivals
+
+    @classmethod
+    def from_feed(cls, feed):
+        """Index every stop of a parsed nyct_gtfs.NYCTFeed"""
+        entries = {}
+        for trip in feed.filter_trips(underway=True):
+            updates = trip.stop_time_updates
+            if not updates:
+                continue
+            # The terminal station is the last stop on the trip
+            terminal = updates[-1].stop_id
+            line = trip.route_id
+            seen = set()
+            for update in updates:
+                if update.stop_id in seen:
+                    continue
+                seen.add(update.stop_id)
+                arrival = update.arrival
+                if arrival:
+                    entries.setdefault(update.stop_id, []).append((arrival.timestamp(), line, terminal))
+        return cls(entries)
+
+    @classmethod
+    def from_feed_bytes(cls, data, stop_ids):
+        """Index only stop_ids, walking the serialized FeedMessage directly.
+
+        Trip updates are decoded only if their bytes mention a wanted stop and
+        vehicle positions only if they mention one of those trips; everything
+        else is skipped at the wire level, so no objects are built for the rest
+        of the feed. Matches from_feed() for the stops it indexes.
+        """
+        from nyct_gtfs.compiled_gtfs import gtfs_realtime_pb2, nyct_subway_pb2
+
+        feed_timestamp = feed_header_timestamp(data)
+        if feed_timestamp is None:
+            raise ValueError("feed header not found")
+        wanted = [stop_id.encode('utf-8') for stop_id in stop_ids]
+
+        def trip_key(trip):
+            return trip.trip_id + " " + trip.Extensions[nyct_subway_pb2.nyct_trip_descriptor].train_id[-7:]
+
+        # Pass 1: decode matching trip updates, remember where the vehicle positions are
+        trip_updates = {}
+        vehicle_spans = []
+        for start, end in iter_message_fields(data, 2):
+            kind = entity_kind(data, start, end)
+            if kind == 3:
+                if any(data.find(stop_id, start, end) != -1 for stop_id in wanted):
+                    trip_update = gtfs_realtime_pb2.FeedEntity.FromString(data[start:end]).trip_update
+                    trip_updates[trip_key(trip_update.trip)] = trip_update
+            elif kind == 4:
+                vehicle_spans.append((start, end))
+
+        # Pass 2: vehicle positions of those trips (a trip is underway once its train reports)
+        trip_ids = {trip_update.trip.trip_id.encode('utf-8') for trip_update in trip_updates.values()}
+        vehicle_timestamps = {}
+        for start, end in vehicle_spans:
+            # FeedEntity.vehicle.trip.trip_id, read without decoding the entity
+            span = (start, end)
+            for field in (4, 1, 1):
+                span = next(iter_message_fields(data, field, *span), None)
+                if span is None:
+                    break
+            if span is not None and data[span[0]:span[1]] in trip_ids:
+                vehicle = gtfs_realtime_pb2.FeedEntity.FromString(data[start:end]).vehicle
+                vehicle_timestamps[trip_key(vehicle.trip)] = vehicle.timestamp
+
+        wanted_stops = set(stop_ids)
+        entries = {}
+        for key, trip_update in trip_updates.items():
+            # Same rule as nyct_gtfs Trip.underway: not future-dated beyond a minute of clock skew
+            vehicle_timestamp = vehicle_timestamps.get(key)
+            if vehicle_timestamp is None or vehicle_timestamp > feed_timestamp + 60:
+                continue
+            updates = trip_update.stop_time_update
+            if not updates:
+                continue
+            terminal = updates[-1].stop_id
+            line = trip_update.trip.route_id
+            seen = set()
+            for update in updates:
+                stop_id = update.stop_id
+                if stop_id not in wanted_stops or stop_id in seen:
+                    continue
+                seen.add(stop_id)
+                if update.HasField('arrival'):
+                    entries.setdefault(stop_id, []).append((float(update.arrival.time), line, terminal))
+        return cls(entries)
+
+    def arrivals(self, stop_id, lines=None):
+        """Sorted (arrival_ts, line, terminal) at stop_id, optionally only for lines"""
+        arrivals = self.arrivals_by_stop.get(stop_id)
+        if not arrivals:
+            return []
+        if lines is not None:
+            arrivals = [arrival for arrival in arrivals if arrival[1] in lines]
+        return arrivals
+
+# Seconds after its predicted arrival that a train is still shown (as "0 min")
+DEPARTED_GRACE = 30
+
+class ArrivalTimeline:
+    """Every upcoming arrival of one lane - all its stops, lines and trips - in time order.
+
+    Departed trains are expired lazily by advancing a start pointer when the
+    timeline is read, and the lane's "soonest line" is picked at read time,
+    so one fetch keeps the board accurate for as long as the timeline lasts.
+    """
+
+    def __init__(self, arrivals=()):
+        self.arrivals = sorted(arrivals, key=lambda arrival: arrival[0])
+        self.start = 0
+
+    def expire(self, now):
+        """Drop trains that arrived more than DEPARTED_GRACE seconds ago"""
+        cutoff = now - DEPARTED_GRACE
+        while self.start < len(self.arrivals) and self.arrivals[self.start][0] < cutoff:
+            self.start += 1
+
+    def upcoming(self, now, lines=None):
+        """Remaining (arrival_ts, line, terminal), optionally only for lines"""
+        self.expire(now)
+        return [arrival for arrival in itertools.islice(self.arrivals, self.start, None)
+                if lines is None or arrival[1] in lines]
+
+    def soonest(self, now, count=3):
+        """(line, its next count arrivals) for the line with the next train, or (None, [])"""
+        self.expire(now)
+        if self.start >= len(self.arrivals):
+            return None, []
+        line = self.arrivals[self.start][1]
+        times = []
+        for arrival in itertools.islice(self.arrivals, self.start, None):
+            if arrival[1] == line:
+                times.append(arrival)
+                if len(times) == count:
+                    break
+        return line, times
+
+    def __len__(self):
+        return len(self.arrivals) - self.start
+
+def read_varint(data, pos):
+    """Decode a protobuf varint at pos; returns (value, next pos)"""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+def iter_message_fields(data, field_number, start=0, end=None):
+    """(start, end) spans of every length-delimited field_number in a serialized message"""
+    pos = start
+    end = len(data) if end is None else end
+    while pos < end:
+        tag, pos = read_varint(data, pos)
+        field, wire_type = tag >> 3, tag & 7
+        if wire_type == 0:
+            _, pos = read_varint(data, pos)
+        elif wire_type == 2:
+            length, pos = read_varint(data, pos)
+            if field == field_number:
+                yield pos, pos + length
+            pos += length
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 5:
+            pos += 4
+        else:
+            raise ValueError(f"unsupported wire type {wire_type}")
+
+def entity_kind(data, start, end):
+    """Field number of the payload of a serialized FeedEntity: 3 trip_update, 4 vehicle, 5 alert (0 if none)"""
+    for field in (3, 4, 5):
+        for _ in iter_message_fields(data, field, start, end):
+            return field
+    return 0
+
+def feed_header_timestamp(data):
+    """FeedHeader.timestamp of a serialized GTFS-realtime FeedMessage, decoding only the header.
+
+    Returns None if the payload does not start with its header (field 1).
+    """
+    try:
+        if not data or data[0] != 0x0A:
+            return None
+        length, pos = read_varint(data, 1)
+        end = pos + length
+        while pos < end:
+            tag, pos = read_varint(data, pos)
+            field, wire_type = tag >> 3, tag & 7
+            if wire_type == 0:
+                value, pos = read_varint(data, pos)
+                if field == 3:
+                    return value
+            elif wire_type == 2:
+                length, pos = read_varint(data, pos)
+                pos += length
+            elif wire_type == 1:
+                pos += 8
+            elif wire_type == 5:
+                pos += 4
+            else:
+                return None
+    except IndexError:
+        pass
+    return None
+
+class FeedFetcher:
+    """Downloads GTFS-realtime feeds and returns their ArrivalIndex, doing as
+    little work as possible when the MTA has not published a new snapshot.
+
+    Requests are conditional (ETag / Last-Modified) where the server supports
+    it; a full download whose header timestamp matches the last parse reuses
+    the previous index instead of parsing again. The last raw payload of each
+    feed is kept in cache_dir, so after a restart a 304 (or an unreachable
+    server on first fetch) can still be answered from disk.
+
+    With stop_ids given, payloads are indexed for just those stops by the
+    streaming decoder (ArrivalIndex.from_feed_bytes); the full nyct_gtfs
+    parse remains the fallback.
+
+    feed_class must behave like nyct_gtfs.NYCTFeed (fetch_immediately, load_gtfs_bytes).
+    """
+
+    def __init__(self, feed_class, cache_dir='.gtfs_cache', timeout=10, stop_ids=None):
+        self.feed_class = feed_class
+        self.set_stop_ids(stop_ids)
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.feeds = {}  # url -> {'index', 'timestamp', 'etag', 'last_modified'}
+        self.lock = threading.Lock()
+
+        self.requests = 0
+        self.bytes_downloaded = 0
+        self.not_modified = 0
+        self.parses = 0
+        self.parses_skipped = 0
+        self.request_seconds = 0.0
+        self.parse_seconds = 0.0
+
+        if self.cache_dir is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                print(f"[MTA Module] Feed disk cache disabled: {e}")
+                self.cache_dir = None
+
+    def fetch(self, url):
+        """ArrivalIndex for the current snapshot of the feed at url"""
+        state = self.feeds.get(url)
+        if state is None:
+            state = self._restore(url)
+
+        headers = {}
+        if state is not None:
+            if state.get('etag'):
+                headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'):
+                headers['If-Modified-Since'] = state['last_modified']
+
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            self._count(requests=1, request_seconds=time.perf_counter() - started)
+        except requests.RequestException:
+            self._count(requests=1, request_seconds=time.perf_counter() - started)
+            if state is not None and url not in self.feeds:
+                # Offline at startup: serve the payload left on disk
+                print(f"[MTA Module] Feed unreachable, using cached payload for {url}")
+                self.feeds[url] = state
+                return state['index']
+            raise
+
+        if response.status_code == 304 and state is not None:
+            self._count(not_modified=1, parses_skipped=1)
+            self.feeds[url] = state
+            return state['index']
+        if response.status_code != 200:
+            raise RuntimeError(f"Error accessing MTA data feed: HTTP {response.status_code}")
+
+        data = response.content
+        self._count(bytes_downloaded=len(data))
+        timestamp = feed_header_timestamp(data)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+        if state is not None and timestamp is not None and timestamp == state['timestamp']:
+            # Same snapshot served again - keep the existing index
+            self._count(parses_skipped=1)
+            state = dict(state, etag=etag, last_modified=last_modified)
+        else:
+            state = {'index': self._parse(url, data), 'timestamp': timestamp,
+                     'etag': etag, 'last_modified': last_modified}
+            self._store(url, data, state)
+        self.feeds[url] = state
+        return state['index']
+
+    def set_stop_ids(self, stop_ids):
+        """Stops the streaming decoder indexes (None: full nyct-gtfs parse)"""
+        self.stop_ids = set(stop_ids) if stop_ids else None
+
+    def forget(self, url):
+        """Drop the cached state of url so its next fetch downloads and parses it afresh"""
+        self.feeds.pop(url, None)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'bytes_downloaded': self.bytes_downloaded,
+            'not_modified': self.not_modified,
+            'parses': self.parses,
+            'parses_skipped': self.parses_skipped,
+            'request_seconds': self.request_seconds,
+            'parse_seconds': self.parse_seconds,
+        }
+
+    def _count(self, **counters):
+        with self.lock:
+            for name, amount in counters.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def _parse(self, url, data):
+        started = time.perf_counter()
+        try:
+            return self._decode(url, data)
+        finally:
+            self._count(parses=1, parse_seconds=time.perf_counter() - started)
+
+    def _decode(self, url, data):
+        if self.stop_ids:
+            try:
+                return ArrivalIndex.from_feed_bytes(data, self.stop_ids)
+            except Exception as e:
+                print(f"[MTA Module] Streaming decode failed, using nyct-gtfs: {e}")
+        feed = self.feed_class(url, fetch_immediately=False)
+        feed.load_gtfs_bytes(data)
+        return ArrivalIndex.from_feed(feed)
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def _restore(self, url):
+        """State rebuilt from the payload stored by a previous run, or None"""
+        if self.cache_dir is None:
+            return None
+        path = self._path(url)
+        try:
+            with open(path + '.pb', 'rb') as f:
+                data = f.read()
+            with open(path + '.json') as f:
+                meta = json.load(f)
+            index = self._parse(url, data)
+        except Exception as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"[MTA Module] Ignoring cached feed {path}: {e}")
+            return None
+        return {'index': index, 'timestamp': feed_header_timestamp(data),
+                'etag': meta.get('etag'), 'last_modified': meta.get('last_modified')}
+
+    def _store(self, url, data, state):
+        if self.cache_dir is None:
+            return
+        path = self._path(url)
+        meta = {'url': url, 'etag': state['etag'], 'last_modified': state['last_modified']}
+        try:
+            with open(path + '.pb.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.pb.tmp', path + '.pb')
+            with open(path + '.json.tmp', 'w') as f:
+                json.dump(meta, f)
+            os.replace(path + '.json.tmp', path + '.json')
+        except OSError as e:
+            print(f"[MTA Module] Could not write {path}: {e}")
+
+class RefreshScheduler:
+    """Decides when each GTFS-realtime feed is next refreshed.
+
+    A feed is normally due every base_interval seconds; slower at night and
+    each time a refresh returned the same snapshot (304 or an unchanged
+    header timestamp), sooner while a train is imminent, and backing off
+    exponentially after errors.
+    """
+
+    def __init__(self, base_interval=30, imminent_interval=15, night_interval=120, max_interval=90,
+                 max_backoff=300, night_hours=(1, 5)):
+        self.base_interval = base_interval
+        self.imminent_interval = imminent_interval
+        self.night_interval = night_interval
+        self.max_interval = max_interval      # Cap on the unchanged-snapshot slowdown
+        self.max_backoff = max_backoff
+        self.night_hours = night_hours        # [start, end) local hours
+        self.feeds = {}  # url -> {'next_due', 'last_refresh', 'errors', 'unchanged'}
+
+    def track(self, urls):
+        for url in urls:
+            self.feeds.setdefault(url, {'next_due': 0, 'last_refresh': 0, 'errors': 0, 'unchanged': 0})
+
+    def untrack(self, url):
+        """Stop scheduling url"""
+        self.feeds.pop(url, None)
+
+    def mark_due(self, url):
+        """Refresh url on the next due() check regardless of its schedule"""
+        self.feeds[url]['next_due'] = 0
+
+    def _due_at(self, state, imminent):
+        if imminent and not state['errors']:
+            return min(state['next_due'], state['last_refresh'] + self.imminent_interval)
+        return state['next_due']
+
+    def due(self, now, imminent=False):
+        """Feeds that should be refreshed now"""
+        return [url for url, state in self.feeds.items() if now >= self._due_at(state, imminent)]
+
+    def next_due(self, imminent=False):
+        """Time the next feed falls due"""
+        return min((self._due_at(state, imminent) for state in self.feeds.values()), default=time.time())
+
+    def record(self, url, ok, changed, now):
+        """Schedule url's next refresh from the outcome of the one that just finished"""
+        state = self.feeds[url]
+        state['last_refresh'] = now
+        if not ok:
+            state['errors'] += 1
+            delay = min(self.base_interval * 2 ** (state['errors'] - 1), self.max_backoff)
+            print(f"[MTA Module] Feed error #{state['errors']}, retrying in {delay}s: {url}")
+        else:
+            state['errors'] = 0
+            state['unchanged'] = 0 if changed else state['unchanged'] + 1
+            start, end = self.night_hours
+            delay = self.night_interval if start <= time.localtime(now).tm_hour < end else self.base_interval
+            if state['unchanged']:
+                delay = max(delay, min(self.base_interval * 1.5 ** state['unchanged'], self.max_interval))
+        state['next_due'] = now + delay
+
+class FeedManager:
+    """Maps configured lines to their GTFS-realtime feeds and fetches the
+    feeds that are due, concurrently on a thread pool.
+
+    fetcher.fetch(url) must return the feed's ArrivalIndex (see FeedFetcher).
+    """
+
+    def __init__(self, fetcher, base_url=MTA_FEED_BASE, max_workers=4):
+        self.fetcher = fetcher
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gtfs-feed')
+
+    def feed_url(self, line):
+        """Feed URL for a line (unknown lines are passed through as-is)"""
+        path = LINE_FEEDS.get(line.upper())
+        return self.base_url + path if path else line
+
+    def fetch_urls(self, urls):
+        """Fetch the given feeds concurrently; returns {url: ArrivalIndex or None on error}"""
+        futures = {url: self.executor.submit(self.fetcher.fetch, url) for url in urls}
+
+        indexes = {}
+        for url, future in futures.items():
+            try:
+                indexes[url] = future.result()
+            except Exception as e:
+                print(f"[MTA Module] Error fetching feed {url}: {e}")
+                indexes[url] = None
+        return indexes
@@ -1,5 +1,7 @@
-import time
+import time, configparser
 from queue import LifoQueue
+from modules.gtfs_feeds import ArrivalTimeline, FeedFetcher, FeedManager, RefreshScheduler, DEPARTED_GRACE, MTA_FEED_BASE
+from modules.stop_index import BOROUGH_LABELS, StopIndex
 
 # MTA subway line colors (official colors)
 LINE_COLORS = {
@@ -40,31 +42,42 @@ TERMINAL_SIMPLIFICATIONS = {
 }
 
 class MTAModule:
-    def __init__(self, config):
+    def __init__(self, config, lanes=None):
         self.invalid = False
         self.queue = LifoQueue()
         self.config = config
-        self.last_fetch_time = 0
-        self.fetch_interval = 30  # Fetch every 30 seconds
-        self.cached_arrivals = {'lane1': None, 'lane2': None}
+        self.fetch_interval = 30  # Base refresh interval, adapted by the scheduler
+        self.imminent_window = 90  # Refresh sooner while a train is this many seconds away
+        self.feed_indexes = {}  # feed url -> last good ArrivalIndex
+        self.timelines = {}  # lane key -> ArrivalTimeline
+        self.stop_index = None  # Opened on first use, resolves terminal stop_ids to names
+        self.stats_interval = 3600  # Seconds between feed traffic summaries in the log
+        self.stats_window_start = time.time()
+        self.stats_at_window_start = None  # feed_fetcher.stats() when the window started
+        # How terminals are shown: full ("Canarsie-Rockaway Pkwy"), short ("Canarsie") or borough ("Bklyn")
+        self.terminal_names = config.get('MTA', 'terminal_names', fallback='full') if config is not None else 'full'
         
         # Parse lane configurations
         self.lanes = {}
         
-        # Try new two-lane config format first
-        if config is not None and 'SubwayLane1' in config:
+        # Lanes given directly (the transit service registers its clients' lanes as they subscribe)
+        if lanes is not None:
+            for n, lane in enumerate(lanes, 1):
+                self.lanes[f'lane{n}'] = lane
+            print(f"[MTA Module] Initialized with {len(self.lanes)} lanes")
+        
+        # Try new two-lane config format first (further [SubwayLane3], ... sections add lanes)
+        elif config is not None and 'SubwayLane1' in config:
             self.lanes['lane1'] = self._parse_lane_config(config, 'SubwayLane1')
             self.lanes['lane2'] = self._parse_lane_config(config, 'SubwayLane2')
+            n = 3
+            while f'SubwayLane{n}' in config:
+                self.lanes[f'lane{n}'] = self._parse_lane_config(config, f'SubwayLane{n}')
+                n += 1
             
-            try:
-                from nyct_gtfs import NYCTFeed  # type: ignore[import-not-found]
-                self.NYCTFeed = NYCTFeed
-                print(f"[MTA Module] Initialized with 2 lanes:")
-                print(f"  Lane 1: stops={self.lanes['lane1']['stop_ids']}, dir={self.lanes['lane1']['direction']}, lines={self.lanes['lane1']['lines']}")
-                print(f"  Lane 2: stops={self.lanes['lane2']['stop_ids']}, dir={self.lanes['lane2']['direction']}, lines={self.lanes['lane2']['lines']}")
-            except ImportError as e:
-                print(f"[MTA Module] nyct-gtfs not installed: {e}")
-                self.invalid = True
+            print(f"[MTA Module] Initialized with {len(self.lanes)} lanes:")
+            for n, lane in enumerate(self.lanes.values(), 1):
+                print(f"  Lane {n}: stops={lane['stop_ids']}, dir={lane['direction']}, lines={lane['lines']}")
                 
         # Fallback to old single [Subway] config
         elif config is not None and 'Subway' in config:
@@ -72,17 +85,98 @@ class MTAModule:
             # Use same config for both lanes (old behavior)
             self.lanes['lane1'] = old_config
             self.lanes['lane2'] = old_config
-            
-            try:
-                from nyct_gtfs import NYCTFeed  # type: ignore[import-not-found]
-                self.NYCTFeed = NYCTFeed
-                print(f"[MTA Module] Initialized (legacy mode) for stops {old_config['stop_ids']}, direction {old_config['direction']}, lines {old_config['lines']}")
-            except ImportError as e:
-                print(f"[MTA Module] nyct-gtfs not installed: {e}")
-                self.invalid = True
+            print(f"[MTA Module] Initialized (legacy mode) for stops {old_config['stop_ids']}, direction {old_config['direction']}, lines {old_config['lines']}")
         else:
             print("[MTA Module] Missing config parameters")
             self.invalid = True
+        
+        self.timelines = {lane_key: ArrivalTimeline() for lane_key in self.lanes}
+        if not self.invalid:
+            self._init_feeds(config)
+    
+    def _init_feeds(self, config):
+        """Set up fetching: lines sharing a GTFS-RT feed (e.g. N/Q/R/W) download and parse it once per refresh"""
+        try:
+            from nyct_gtfs import NYCTFeed  # type: ignore[import-not-found]
+            self.NYCTFeed = NYCTFeed
+        except ImportError as e:
+            print(f"[MTA Module] nyct-gtfs not installed: {e}")
+            self.invalid = True
+            return
+        
+        if config is None:
+            config = configparser.ConfigParser()  # Lanes given directly: every setting falls back to its default
+        base_url = config.get('MTA', 'feed_base_url', fallback=MTA_FEED_BASE)
+        cache_dir = config.get('MTA', 'feed_cache_dir', fallback='.gtfs_cache')
+        # The streaming decoder only materialises trips touching our stops; 'nyct' parses whole feeds
+        self.stream_decode = config.get('MTA', 'decoder', fallback='stream') == 'stream'
+        self.feed_fetcher = FeedFetcher(self.NYCTFeed, cache_dir=cache_dir, stop_ids=self._lane_stop_ids())
+        self.feed_manager = FeedManager(self.feed_fetcher, base_url=base_url)
+        
+        # One scheduler decides when each feed is refreshed; the display asks it when to wake up
+        self.line_feeds = {}
+        self.scheduler = RefreshScheduler(base_interval=self.fetch_interval)
+        self._track_lines(self.lanes.values())
+    
+    def _lane_stop_ids(self):
+        if not self.stream_decode:
+            return None
+        return {f"{stop_id}{lane['direction']}" for lane in self.lanes.values() for stop_id in lane['stop_ids']}
+    
+    def _track_lines(self, lanes):
+        lines = {line.upper() for lane in lanes for line in lane['lines']}
+        self.line_feeds.update({line: self.feed_manager.feed_url(line) for line in lines})
+        self.scheduler.track({self.line_feeds[line] for line in lines})
+    
+    def addLane(self, lane_config):
+        """Register a lane at runtime (used by the transit service); returns its key.
+
+        Feeds serving the new lane are refetched and re-indexed on the next getArrivals().
+        """
+        for lane_key, lane in self.lanes.items():
+            if lane == lane_config:
+                return lane_key
+        n = len(self.lanes) + 1
+        while f"lane{n}" in self.lanes:  # Keys of removed lanes leave gaps
+            n += 1
+        lane_key = f"lane{n}"
+        self.lanes[lane_key] = lane_config
+        self.timelines[lane_key] = ArrivalTimeline()
+        if self.invalid:
+            return lane_key
+        
+        self._track_lines([lane_config])
+        self.feed_fetcher.set_stop_ids(self._lane_stop_ids())
+        for line in lane_config['lines']:
+            url = self.line_feeds[line.upper()]
+            self.feed_fetcher.forget(url)
+            self.feed_indexes.pop(url, None)
+            self.scheduler.mark_due(url)
+        print(f"[MTA Module] Added {lane_key}: stops={lane_config['stop_ids']}, dir={lane_config['direction']}, lines={lane_config['lines']}")
+        return lane_key
+    
+    def removeLane(self, lane_key):
+        """Unregister a lane added with addLane() (used by the transit service).
+
+        Feeds that no remaining lane needs stop being refreshed, and the
+        streaming decoder stops indexing the lane's stops.
+        """
+        lane_config = self.lanes.pop(lane_key, None)
+        if lane_config is None:
+            return
+        self.timelines.pop(lane_key, None)
+        if self.invalid:
+            return
+        
+        remaining = {line.upper() for lane in self.lanes.values() for line in lane['lines']}
+        for line in {line.upper() for line in lane_config['lines']} - remaining:
+            url = self.line_feeds.pop(line)
+            if url not in self.line_feeds.values():
+                self.scheduler.untrack(url)
+                self.feed_fetcher.forget(url)
+                self.feed_indexes.pop(url, None)
+        self.feed_fetcher.set_stop_ids(self._lane_stop_ids())
+        print(f"[MTA Module] Removed {lane_key}: stops={lane_config['stop_ids']}, dir={lane_config['direction']}, lines={lane_config['lines']}")
     
     def _parse_lane_config(self, config, section):
         """Parse configuration for a single lane."""
@@ -111,106 +205,106 @@ class MTAModule:
             return terminal_name
         return TERMINAL_SIMPLIFICATIONS.get(terminal_name, terminal_name)
     
+    def _terminal_name(self, stop_id):
+        """Display name of a terminal stop_id from the static stop index, or None if unknown"""
+        if self.stop_index is None:
+            try:
+                self.stop_index = StopIndex.open()
+            except Exception as e:
+                print(f"[MTA Module] Stop index unavailable, showing directions instead of terminals: {e}")
+                self.stop_index = False
+        stop = self.stop_index.lookup(stop_id) if self.stop_index is not False and stop_id else None
+        if stop is None:
+            return None
+        if stop.name in TERMINAL_SIMPLIFICATIONS:
+            return self._simplify_terminal(stop.name)
+        if self.terminal_names == 'borough' and stop.borough:
+            return BOROUGH_LABELS[stop.borough]
+        if self.terminal_names == 'short':
+            return stop.short_name
+        return stop.name
+    
     def _get_direction_name(self, direction):
         """Get readable direction name based on direction code"""
         return "Uptown" if direction == 'N' else "Downtown"
     
-    def _fetch_lane_arrivals(self, lane_config):
-        """Fetch arrivals for a single lane configuration."""
-        current_time = time.time()
-        line_arrivals = {}
+    def _build_lane_timeline(self, lane_config, feeds, previous):
+        """Every upcoming arrival of a lane from the indexes of the already-fetched feeds.
+
+        Lines whose feed failed this cycle keep their entries from the previous timeline.
+        """
+        lines = {line.upper() for line in lane_config['lines']}
         
-        for line in lane_config['lines']:
+        # Lines sharing a feed are answered by the same index
+        lines_by_index = {}
+        stale_lines = set()
+        for line in lines:
+            index = feeds.get(line)
+            if index is None:
+                stale_lines.add(line)  # Feed failed to download this cycle
+                continue
+            lines_by_index.setdefault(id(index), (index, set()))[1].add(line)
+        
+        arrivals = previous.upcoming(time.time(), stale_lines) if stale_lines else []
+        for index, index_lines in lines_by_index.values():
             try:
-                feed = self.NYCTFeed(line)
-                times_for_line = []
-                
-                # Try each stop ID for this line
                 for stop_id in lane_config['stop_ids']:
                     stop_id_with_dir = f"{stop_id}{lane_config['direction']}"
-                    
-                    # Filter trips headed to our stop
-                    trips = feed.filter_trips(
-                        line_id=[line.upper()],
-                        headed_for_stop_id=[stop_id_with_dir],
-                        underway=True
-                    )
-                    
-                    for trip in trips:
-                        # Get the terminal station (last stop on the trip)
-                        terminal_station = None
-                        if trip.stop_time_updates:
-                            terminal_station = trip.stop_time_updates[-1].stop_name
-                        
-                        # Find the stop time for our stop
-                        for stop_update in trip.stop_time_updates:
-                            if stop_update.stop_id == stop_id_with_dir:
-                                arrival_time = stop_update.arrival
-                                if arrival_time:
-                                    minutes_away = max(0, int((arrival_time.timestamp() - current_time) / 60))
-                                    times_for_line.append({
-                                        'minutes': minutes_away,
-                                        'arrival_timestamp': arrival_time.timestamp(),
-                                        'terminal': terminal_station
-                                    })
-                                break
-                
-                # Sort times and keep top 3
-                times_for_line.sort(key=lambda x: x['minutes'])
-                if times_for_line:
-                    # Use the terminal station from the first train as the direction
-                    # Simplify to borough/neighborhood name like real subway signs
-                    raw_terminal = times_for_line[0].get('terminal')
-                    terminal = self._simplify_terminal(raw_terminal) or self._get_direction_name(lane_config['direction'])
-                    line_arrivals[line.upper()] = {
-                        'line': line.upper(),
-                        'direction': terminal,
-                        'times': times_for_line[:3],
-                        'color': self.get_line_color(line)
-                    }
-                            
+                    arrivals.extend(index.arrivals(stop_id_with_dir, index_lines))
             except Exception as e:
-                print(f"[MTA Module] Error fetching line {line}: {e}")
-                continue
+                print(f"[MTA Module] Error reading lines {','.join(sorted(index_lines))}: {e}")
+        
+        return ArrivalTimeline(arrivals)
+    
+    def _lane_arrival(self, lane_config, timeline, current_time):
+        """The lane's soonest line with its next three trains, or None once the timeline runs dry"""
+        line, upcoming = timeline.soonest(current_time, count=3)
+        if not upcoming:
+            return None
         
-        # Convert to list sorted by first arrival time
-        result = list(line_arrivals.values())
-        result.sort(key=lambda x: x['times'][0]['minutes'] if x['times'] else 999)
+        times = [{
+            'minutes': max(0, int((arrival_ts - current_time) / 60)),
+            'arrival_timestamp': arrival_ts,
+            'terminal': self._terminal_name(terminal)
+        } for arrival_ts, _, terminal in upcoming]
         
-        # Return the first (soonest) train for this lane
-        return result[0] if result else None
+        # Use the terminal station from the first train as the direction
+        # Simplified to borough/neighborhood name like real subway signs
+        terminal = times[0]['terminal'] or self._get_direction_name(lane_config['direction'])
+        return {
+            'line': line,
+            'direction': terminal,
+            'times': times,
+            'color': self.get_line_color(line)
+        }
     
     def getArrivals(self):
-        """Fetch upcoming train arrivals for both lanes."""
+        """Upcoming train arrivals for each lane, refreshing the feeds that are due."""
         if self.invalid:
             return []
         
         current_time = time.time()
-        
-        # Use cached data if within fetch interval
-        if current_time - self.last_fetch_time < self.fetch_interval:
-            cached = self._get_cached_with_updated_times()
-            if cached:
-                return cached
+        due = self.scheduler.due(current_time, self._train_imminent(current_time))
+        if not due:
+            return self._get_cached_with_updated_times() or []
         
         try:
-            # Fetch arrivals for each lane
-            lane1_arrival = self._fetch_lane_arrivals(self.lanes['lane1'])
-            lane2_arrival = self._fetch_lane_arrivals(self.lanes['lane2'])
+            # Fetch each due feed once (concurrently), then answer every lane from the indexes
+            indexes = self.feed_manager.fetch_urls(due)
+            for url, index in indexes.items():
+                changed = index is not self.feed_indexes.get(url)
+                self.scheduler.record(url, index is not None, changed, current_time)
+                if index is not None:
+                    self.feed_indexes[url] = index
+            self._maybe_log_stats(current_time)
             
-            # Cache the results
-            self.cached_arrivals = {
-                'lane1': lane1_arrival,
-                'lane2': lane2_arrival
+            feeds = {line: self.feed_indexes.get(url) for line, url in self.line_feeds.items()}
+            self.timelines = {
+                lane_key: self._build_lane_timeline(lane_config, feeds, self.timelines[lane_key])
+                for lane_key, lane_config in self.lanes.items()
             }
-            self.last_fetch_time = current_time
             
-            # Build result list
-            result = []
-            if lane1_arrival:
-                result.append(lane1_arrival)
-            if lane2_arrival:
-                result.append(lane2_arrival)
+            result = self._get_cached_with_updated_times() or []
             
             # Put in queue for display
             if result:
@@ -222,33 +316,61 @@ class MTAModule:
             print(f"[MTA Module] Error fetching arrivals: {e}")
             return self._get_cached_with_updated_times() or []
     
+    def _maybe_log_stats(self, current_time):
+        """Summarise feed traffic over the last stats_interval seconds"""
+        if self.stats_at_window_start is None:
+            self.stats_at_window_start = self.feed_fetcher.stats()
+        elapsed = current_time - self.stats_window_start
+        if elapsed < self.stats_interval:
+            return
+        stats = self.feed_fetcher.stats()
+        window = {key: stats[key] - self.stats_at_window_start.get(key, 0) for key in stats}
+        print(f"[MTA Module] Feeds in the last {elapsed / 60:.0f} min: {window['requests']} requests, "
+              f"{window['bytes_downloaded'] / 1024:.0f} KiB downloaded, {window['not_modified']} not modified, "
+              f"{window['parses']} parsed, {window['parses_skipped']} parses skipped")
+        self.stats_window_start = current_time
+        self.stats_at_window_start = stats
+    
+    def _train_imminent(self, current_time):
+        """True if any lane's next train arrives within imminent_window seconds"""
+        for timeline in self.timelines.values():
+            _, upcoming = timeline.soonest(current_time, count=1)
+            if upcoming and upcoming[0][0] - current_time <= self.imminent_window:
+                return True
+        return False
+    
+    def nextUpdateDelay(self):
+        """Seconds until getArrivals() has something new: a feed refresh falls due or a shown minute ticks over"""
+        if self.invalid:
+            return 30
+        current_time = time.time()
+        wake = self.nextRefreshTime()
+        return min(60, max(1, self._next_board_change(current_time, wake) - current_time))
+    
+    def nextRefreshTime(self):
+        """Time the next feed refresh falls due"""
+        return self.scheduler.next_due(self._train_imminent(time.time()))
+    
+    def _next_board_change(self, current_time, wake):
+        """Earliest of wake and the time a minute shown on the board ticks over or a train departs"""
+        for timeline in self.timelines.values():
+            _, upcoming = timeline.soonest(current_time, count=3)
+            for arrival_ts, _, _ in upcoming:
+                remaining = arrival_ts - current_time
+                if remaining > 0:
+                    wake = min(wake, current_time + remaining % 60 + 0.05)
+                else:
+                    wake = min(wake, arrival_ts + DEPARTED_GRACE + 0.05)
+        return wake
+    
     def _get_cached_with_updated_times(self):
-        """Get cached arrivals with updated time calculations."""
-        if not self.cached_arrivals['lane1'] and not self.cached_arrivals['lane2']:
-            return None
-        
+        """Read every lane from its cached timeline at the current time."""
         current_time = time.time()
         result = []
         
-        for lane_key in ['lane1', 'lane2']:
-            cached = self.cached_arrivals.get(lane_key)
-            if cached:
-                updated_times = []
-                for t in cached['times']:
-                    minutes = max(0, int((t['arrival_timestamp'] - current_time) / 60))
-                    if minutes >= 0:
-                        updated_times.append({
-                            'minutes': minutes,
-                            'arrival_timestamp': t['arrival_timestamp'],
-                            'terminal': t.get('terminal')
-                        })
-                
-                if updated_times:
-                    result.append({
-                        'line': cached['line'],
-                        'direction': cached['direction'],
-                        'times': updated_times[:3],
-                        'color': cached['color']
-                    })
+        for lane_key in self.lanes:
+            lane_arrival = self._lane_arrival(self.lanes[lane_key], self.timelines[lane_key], current_time)
+            if lane_arrival:
+                result.append(lane_arrival)
         
         return result if result else None
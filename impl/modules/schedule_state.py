@@ -0,0 +1,128 @@
+import os, json, time
+from datetime import datetime, timedelta
+
+SUNRISE_DURATION_MINUTES = 30
+
+class ScheduleState:
+    """The display's sleep schedule (.schedule, written by the webapp), ready for per-frame checks.
+
+    The file is re-read only when its mtime changes, looked at no more than
+    once per check_interval. Parsing precomputes the next off, sunrise-start
+    and on timestamps, so is_sleeping() and sunrise_progress() are a few
+    float comparisons until the next transition passes.
+
+    The display sleeps from off_time until on_time (crossing midnight when
+    off_time is later), except for the sunrise: the sunrise_minutes before
+    on_time, when sunrise_progress() ramps from 0 to 1.
+    """
+
+    def __init__(self, path, sunrise_minutes=SUNRISE_DURATION_MINUTES, check_interval=1.0, clock=time.time):
+        self.path = path
+        self.sunrise_seconds = sunrise_minutes * 60
+        self.check_interval = check_interval
+        self.clock = clock
+
+        self.mtime = None
+        self.next_check = 0
+        self.schedule = None  # Parsed file contents, or None when absent/invalid
+        self.enabled = False
+        self.off_time = None
+        self.on_time = None
+
+        # Precomputed for the current stretch of time, valid until valid_until
+        self.valid_until = 0
+        self.sleeping = False      # Inside the off window (the sunrise part included)
+        self.next_off = None
+        self.sunrise_start = None
+        self.next_on = None
+
+    def refresh(self, now=None):
+        """Reload the file if it changed and recompute transitions that have passed"""
+        now = self.clock() if now is None else now
+        if now >= self.next_check:
+            self.next_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self.mtime:
+                self.mtime = mtime
+                self._load()
+                self.valid_until = 0
+        if now >= self.valid_until:
+            self._compute(now)
+
+    def reload(self):
+        """Look at the file on the next check even if check_interval hasn't passed"""
+        self.next_check = 0
+
+    def is_sleeping(self, now=None):
+        """True while the display should be off (not during the sunrise)"""
+        now = self.clock() if now is None else now
+        self.refresh(now)
+        return self.sleeping and not self._in_sunrise(now)
+
+    def sunrise_progress(self, now=None):
+        """0.0-1.0 within the sunrise_minutes before on_time, else 0"""
+        now = self.clock() if now is None else now
+        self.refresh(now)
+        if not self._in_sunrise(now):
+            return 0.0
+        return min(1.0, (now - self.sunrise_start) / self.sunrise_seconds)
+
+    def next_transition(self, now=None):
+        """Timestamp of the next off, sunrise-start or on transition, or None without a schedule"""
+        now = self.clock() if now is None else now
+        self.refresh(now)
+        return self.valid_until if self.enabled else None
+
+    def _in_sunrise(self, now):
+        return self.enabled and self.sunrise_start <= now < self.next_on
+
+    def _load(self):
+        self.schedule = None
+        self.enabled = False
+        if self.mtime is None:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self.schedule = json.load(f)
+            self.enabled = bool(self.schedule.get('enabled', False))
+            self.off_time = datetime.strptime(self.schedule.get('off_time', '23:00'), '%H:%M').time()
+            self.on_time = datetime.strptime(self.schedule['on_time'], '%H:%M').time()
+        except Exception as e:
+            print(f"[Schedule] Ignoring unreadable schedule {self.path}: {e}")
+            self.schedule = None
+            self.enabled = False
+            return
+        # The webapp also sets the system timezone; pick it up for local times
+        if hasattr(time, 'tzset'):
+            time.tzset()
+
+    def _compute(self, now):
+        if not self.enabled:
+            self.sleeping = False
+            self.next_off = self.sunrise_start = self.next_on = None
+            self.valid_until = float('inf')  # Until the file changes
+            return
+
+        current = datetime.fromtimestamp(now)
+        time_of_day = current.time()
+        if self.off_time > self.on_time:
+            # Sleep window crosses midnight (e.g. 23:00 - 07:00)
+            self.sleeping = time_of_day >= self.off_time or time_of_day < self.on_time
+        else:
+            self.sleeping = self.off_time <= time_of_day < self.on_time
+
+        self.next_off = self._next_occurrence(current, self.off_time)
+        self.next_on = self._next_occurrence(current, self.on_time)
+        self.sunrise_start = self.next_on - self.sunrise_seconds
+        self.valid_until = min(t for t in (self.next_off, self.sunrise_start, self.next_on) if t > now)
+
+    @staticmethod
+    def _next_occurrence(current, time_of_day):
+        """Timestamp of the first time_of_day strictly after current"""
+        candidate = datetime.combine(current.date(), time_of_day)
+        if candidate <= current:
+            candidate += timedelta(days=1)
+        return candidate.timestamp()
@@ -9,6 +9,24 @@ class SpotifyModule:
         self.queue = LifoQueue()
         self.config = config
         self.consecutive_401s = 0
+        self.isPlaying = False
+        self.current_track_id = None
+        self.next_art_url = None
+
+        # Adaptive polling: seconds between polls per playback state
+        self.poll_interval_playing = 5
+        self.poll_interval_paused = 15
+        self.poll_interval_idle = 15
+        self.playback_state = 'idle'  # 'playing', 'paused' or 'idle'
+        self.track_end_time = None  # Predicted time.time() at which the current track ends
+        self.end_polled_track = None  # Track whose end-aligned poll already ran (stale progress doesn't re-arm it)
+        self.backoff_until = 0
+        self.consecutive_errors = 0
+
+        # Device list for device_whitelist checks, refreshed at most every devices_ttl seconds
+        self.devices = None
+        self.devices_fetched_at = 0
+        self.devices_ttl = 30
         
         if config is not None and 'Spotify' in config and 'client_id' in config['Spotify'] \
             and 'client_secret' in config['Spotify'] and 'redirect_uri' in config['Spotify']:
@@ -39,10 +57,8 @@ class SpotifyModule:
     
     def isDeviceWhitelisted(self):
         if self.config is not None and 'Spotify' in self.config and 'device_whitelist' in self.config['Spotify']:
-            try:
-                devices = self.sp.devices()
-            except Exception as e:
-                print(e)
+            devices = self.getDevices()
+            if devices is None:
                 return False
             
             device_whitelist = self.config['Spotify']['device_whitelist']
@@ -53,6 +69,75 @@ class SpotifyModule:
         else:
             return True
 
+    def getDevices(self):
+        """Device list, cached for devices_ttl seconds"""
+        if self.devices is None or time.time() - self.devices_fetched_at >= self.devices_ttl:
+            try:
+                self.devices = self.sp.devices()
+                self.devices_fetched_at = time.time()
+            except SpotifyException as e:
+                self.handleRateLimit(e)
+                print(e)
+                return None
+            except Exception as e:
+                print(e)
+                return None
+        return self.devices
+
+    def nextPollDelay(self):
+        """Seconds until the next getCurrentPlayback() call.
+
+        Slower while paused or idle, never later than the predicted end of the
+        playing track (once per track, so stuck progress falls back to the
+        playing interval), and backing off after errors or a 429 Retry-After.
+        """
+        now = time.time()
+        if now < self.backoff_until:
+            return self.backoff_until - now
+        if self.consecutive_errors:
+            return min(60, 2 ** self.consecutive_errors)
+
+        if self.playback_state == 'playing':
+            delay = self.poll_interval_playing
+            if self.track_end_time is not None:
+                # poll just after the track should have ended to pick up the next one
+                delay = min(delay, max(0.5, self.track_end_time - now + 0.5))
+            return delay
+        if self.playback_state == 'paused':
+            return self.poll_interval_paused
+        return self.poll_interval_idle
+
+    def isBackingOff(self):
+        """True while nextPollDelay() is a 429 or error backoff rather than the normal cadence"""
+        return time.time() < self.backoff_until or self.consecutive_errors > 0
+
+    def handleRateLimit(self, e):
+        """Honour Retry-After on 429 responses"""
+        if e.http_status == 429:
+            try:
+                retry_after = int((e.headers or {}).get('Retry-After', 30))
+            except (TypeError, ValueError):
+                retry_after = 30
+            self.backoff_until = time.time() + retry_after
+            print(f"[Spotify] Rate limited, backing off for {retry_after}s")
+            return True
+        return False
+
+    def getNextArtUrl(self):
+        """Album art URL of the next track in the user's queue, for prefetching"""
+        try:
+            user_queue = self.sp.queue()
+        except SpotifyException as e:
+            if not self.handleRateLimit(e):
+                print(f"[Spotify] Could not read queue: {e}")
+            return None
+        except Exception as e:
+            print(f"[Spotify] Could not read queue: {e}")
+            return None
+        if user_queue and user_queue.get('queue'):
+            return getArtUrl(user_queue['queue'][0])
+        return None
+
     def getCurrentPlayback(self):
         # self.calls +=1
         # print("spotify fetches: " + str(self.calls))
@@ -61,6 +146,8 @@ class SpotifyModule:
             return
         try:
             track = self.sp.current_user_playing_track()
+            if self.track_end_time is not None and time.time() >= self.track_end_time:
+                self.end_polled_track = self.current_track_id  # This was the poll aligned to its end
 
             if (track is not None and self.isDeviceWhitelisted()):
                 if (track['item'] is None):
@@ -72,16 +159,36 @@ class SpotifyModule:
                     if len(track['item']['artists']) >= 2:
                         artist = artist + ", " + track['item']['artists'][1]['name']
                     title = track['item']['name']
-                    art_url = track['item']['album']['images'][0]['url']
+                    art_url = getArtUrl(track['item'])
+                    if track['item'].get('id') != self.current_track_id:
+                        self.current_track_id = track['item'].get('id')
+                        self.next_art_url = self.getNextArtUrl()
+                if self.isPlaying != track['is_playing']:
+                    self.devices = None  # Device may have changed along with the playback state
                 self.isPlaying = track['is_playing']
+                self.playback_state = 'playing' if self.isPlaying else 'paused'
+                self.track_end_time = None
+                if self.isPlaying and track['progress_ms'] is not None and track['item'] is not None \
+                        and self.current_track_id != self.end_polled_track:
+                    remaining = (track['item']['duration_ms'] - track['progress_ms']) / 1000
+                    if remaining > 0:
+                        self.track_end_time = time.time() + remaining
 
                 self.queue.put((artist, title, art_url, self.isPlaying, track["progress_ms"], track["item"]["duration_ms"]))
                 self.consecutive_401s = 0  # Reset on success
             elif (track is None):
                 self.queue.put(None)
                 self.consecutive_401s = 0  # Reset on success
+                self.playback_state = 'idle'
+                self.track_end_time = None
+            else:
+                self.playback_state = 'idle'
+                self.track_end_time = None
+            self.consecutive_errors = 0
         except SpotifyException as e:
-            if e.http_status == 401:
+            if self.handleRateLimit(e):
+                pass
+            elif e.http_status == 401:
                 self.consecutive_401s += 1
                 if self.consecutive_401s <= 3:
                     # Try forcing a token refresh - don't trust expires_at
@@ -95,5 +202,22 @@ class SpotifyModule:
                 # Suppress further spam after 4 attempts
             else:
                 print(e)
+                self.consecutive_errors += 1
         except Exception as e:
             print(e)
+            self.consecutive_errors += 1
+
+def getArtUrl(item, min_size=64):
+    """Album art URL for a track (or podcast episode) item.
+
+    Picks the smallest image that still covers min_size (Spotify usually offers
+    640, 300 and 64px), falling back to the first (largest) image.
+    """
+    images = item['album']['images'] if 'album' in item else item.get('images', [])
+    if not images:
+        return None
+    adequate = [image for image in images
+                if (image.get('width') or 0) >= min_size and (image.get('height') or 0) >= min_size]
+    if adequate:
+        return min(adequate, key=lambda image: image['width'] * image['height'])['url']
+    return images[0]['url']
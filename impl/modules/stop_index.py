@@ -0,0 +1,205 @@
+import os, csv, mmap, struct
+from collections import namedtuple
+
+# Compiled by build_stop_index.py (or on first use) from the static GTFS stops.txt
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'stop_index.bin')
+
+StopInfo = namedtuple('StopInfo', ['stop_id', 'name', 'parent', 'borough', 'short_name'])
+
+BOROUGHS = ['', 'M', 'Bk', 'Q', 'Bx', 'SI']
+BOROUGH_LABELS = {'M': 'Mhtn', 'Bk': 'Bklyn', 'Q': 'Qns', 'Bx': 'Bronx', 'SI': 'SI'}
+
+# File layout: header, open-addressing hash table of fixed-size slots, string blob
+MAGIC = b'STIX'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')           # magic, version, reserved, slot count, blob offset
+SLOT = struct.Struct('<8sIHIH8sBx')         # stop_id, name off/len, short name off/len, parent, borough
+
+# Rough borough outlines (lat, lon) for stops.txt files without borough data;
+# accurate for subway stations, which is all the display needs
+MANHATTAN = [(40.700, -74.020), (40.880, -74.020), (40.880, -73.908), (40.866, -73.911), (40.850, -73.918),
+             (40.835, -73.930), (40.790, -73.928), (40.770, -73.935), (40.755, -73.947), (40.742, -73.965),
+             (40.720, -73.970), (40.712, -73.975), (40.700, -74.000)]
+BROOKLYN = [(40.740, -73.962), (40.724, -73.935), (40.710, -73.918), (40.701, -73.910), (40.694, -73.900),
+            (40.693, -73.885), (40.6895, -73.866), (40.680, -73.862), (40.560, -73.862), (40.560, -74.045),
+            (40.700, -74.045), (40.740, -74.000)]
+
+
+def stop_hash(key):
+    """32-bit FNV-1a of the stop_id bytes"""
+    h = 0x811C9DC5
+    for byte in key:
+        h = ((h ^ byte) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+
+def _inside(lat, lon, polygon):
+    inside = False
+    for (lat1, lon1), (lat2, lon2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (lon1 > lon) != (lon2 > lon) and lat < lat1 + (lon - lon1) * (lat2 - lat1) / (lon2 - lon1):
+            inside = not inside
+    return inside
+
+
+def borough_from_location(lat, lon):
+    """Approximate borough code of a subway station from its coordinates"""
+    if lat < 40.65 and lon < -74.05:
+        return 'SI'
+    if _inside(lat, lon, MANHATTAN):
+        return 'M'
+    if lat > 40.795:
+        return 'Bx'
+    if _inside(lat, lon, BROOKLYN):
+        return 'Bk'
+    return 'Q'
+
+
+def short_display_name(name):
+    """Sign-friendly station name: the neighbourhood part of "Astoria-Ditmars Blvd",
+    "Union Sq" rather than "14 St" in "14 St-Union Sq"."""
+    parts = [part.strip() for part in name.split('-') if part.strip()]
+    if len(parts) < 2:
+        return name
+    for part in parts:
+        if not part[0].isdigit():
+            return part
+    return parts[0]
+
+
+def read_boroughs(stations_csv):
+    """{GTFS stop_id: borough code} from the MTA's Stations.csv"""
+    boroughs = {}
+    with open(stations_csv, newline='') as f:
+        for row in csv.DictReader(f):
+            stop_id, borough = row.get('GTFS Stop ID'), row.get('Borough')
+            if stop_id and borough in BOROUGHS:
+                boroughs[stop_id.strip()] = borough
+    return boroughs
+
+
+def build_index(stops_txt, boroughs=None):
+    """Compile a GTFS stops.txt into the binary index; returns the bytes"""
+    with open(stops_txt, newline='') as f:
+        rows = list(csv.DictReader(f))
+    boroughs = dict(boroughs or {})
+    for row in rows:
+        if not row.get('parent_station') and row['stop_id'] not in boroughs:
+            try:
+                boroughs[row['stop_id']] = borough_from_location(float(row['stop_lat']), float(row['stop_lon']))
+            except (KeyError, ValueError):
+                pass
+
+    blob = bytearray()
+    strings = {}
+
+    def add_string(text):
+        if text not in strings:
+            data = text.encode('utf-8')
+            strings[text] = (len(blob), len(data))
+            blob.extend(data)
+        return strings[text]
+
+    slot_count = 1
+    while slot_count < len(rows) * 2:
+        slot_count *= 2
+    slots = [None] * slot_count
+    for row in rows:
+        stop_id = row['stop_id'].encode('ascii')
+        if len(stop_id) > 8:
+            raise ValueError(f"stop_id too long for the index: {row['stop_id']}")
+        parent = row.get('parent_station') or ''
+        name = row['stop_name']
+        borough = boroughs.get(parent or row['stop_id'], '')
+        record = (stop_id, *add_string(name), *add_string(short_display_name(name)),
+                  parent.encode('ascii'), BOROUGHS.index(borough))
+        i = stop_hash(stop_id) & (slot_count - 1)
+        while slots[i] is not None and slots[i][0] != stop_id:
+            i = (i + 1) & (slot_count - 1)
+        slots[i] = record
+
+    blob_offset = HEADER.size + slot_count * SLOT.size
+    out = bytearray(HEADER.pack(MAGIC, VERSION, 0, slot_count, blob_offset))
+    empty = SLOT.pack(b'', 0, 0, 0, 0, b'', 0)
+    for record in slots:
+        out.extend(SLOT.pack(*record) if record is not None else empty)
+    out.extend(blob)
+    return bytes(out)
+
+
+def default_stops_txt():
+    import nyct_gtfs
+    return os.path.join(os.path.dirname(nyct_gtfs.__file__), 'gtfs_static', 'stops.txt')
+
+
+class StopIndex:
+    """Read-only stop_id -> StopInfo table over a memory-mapped compiled index.
+
+    Lookups hash the stop_id into a fixed-size slot table and only touch the
+    pages they read, so the whole station list costs almost no RSS.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, version, _, self.slot_count, self.blob_offset = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a stop index (rebuild it with build_stop_index.py)")
+        self.mask = self.slot_count - 1
+
+    @classmethod
+    def open(cls, path=DEFAULT_INDEX_PATH):
+        """Map the index at path, compiling it from nyct-gtfs's stops.txt first if it is missing"""
+        if not os.path.exists(path):
+            print(f"[Stop Index] {path} not found, building it from the bundled stops.txt")
+            data = build_index(default_stops_txt())
+            try:
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(path + '.tmp', path)
+            except OSError as e:
+                print(f"[Stop Index] Could not write {path}, keeping it in memory: {e}")
+                return cls(data)
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _slot(self, stop_id):
+        key = stop_id.encode('ascii', 'replace')
+        if len(key) > 8:
+            return None
+        i = stop_hash(key) & self.mask
+        while True:
+            slot = SLOT.unpack_from(self.buffer, HEADER.size + i * SLOT.size)
+            if not slot[0][0]:
+                return None  # Empty slot
+            if slot[0].rstrip(b'\0') == key:
+                return slot
+            i = (i + 1) & self.mask
+
+    def _string(self, offset, length):
+        start = self.blob_offset + offset
+        return self.buffer[start:start + length].decode('utf-8')
+
+    def lookup(self, stop_id):
+        """StopInfo for a station ("R20") or platform ("R20N") ID, or None"""
+        slot = self._slot(stop_id)
+        if slot is None:
+            return None
+        key, name_offset, name_length, short_offset, short_length, parent, borough = slot
+        return StopInfo(key.rstrip(b'\0').decode('ascii'), self._string(name_offset, name_length),
+                        parent.rstrip(b'\0').decode('ascii'), BOROUGHS[borough],
+                        self._string(short_offset, short_length))
+
+    def is_station(self, stop_id):
+        """True for parent station IDs, the form lanes are configured with"""
+        slot = self._slot(stop_id)
+        return slot is not None and not slot[5].rstrip(b'\0')
+
+    def __contains__(self, stop_id):
+        return self._slot(stop_id) is not None
+
+    def __bool__(self):
+        return True  # Without this, truth tests would fall back to the full-table __len__
+
+    def __len__(self):
+        """Number of stops; scans every slot, so not for per-lookup use"""
+        return sum(1 for i in range(self.slot_count)
+                   if self.buffer[HEADER.size + i * SLOT.size] != 0)
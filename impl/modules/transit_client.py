@@ -0,0 +1,102 @@
+import json, socket, threading, time
+from modules.mta_module import MTAModule
+from modules.gtfs_feeds import ArrivalTimeline
+
+DEFAULT_SERVICE_ADDRESS = 'unix:/tmp/matrix-transit.sock'
+
+def parse_address(address):
+    """('unix', path) or ('tcp', (host, port)) from 'unix:/path/to.sock' or 'tcp:host:port'"""
+    kind, _, rest = address.partition(':')
+    if kind == 'unix' and rest:
+        return 'unix', rest
+    if kind == 'tcp':
+        host, _, port = rest.rpartition(':')
+        return 'tcp', (host or '127.0.0.1', int(port))
+    raise ValueError(f"Invalid transit service address: {address} (use unix:/path or tcp:host:port)")
+
+def connect(address, timeout=10):
+    kind, target = parse_address(address)
+    sock = socket.socket(socket.AF_UNIX if kind == 'unix' else socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(target)
+    except OSError:
+        sock.close()
+        raise
+    sock.settimeout(None)
+    return sock
+
+def send_message(sock, message):
+    """Messages are newline-delimited JSON objects"""
+    sock.sendall((json.dumps(message, separators=(',', ':')) + '\n').encode('utf-8'))
+
+def read_messages(sock):
+    with sock.makefile('r', encoding='utf-8') as stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+class TransitClient(MTAModule):
+    """MTAModule that gets its lanes' arrival timelines from the shared transit
+    service (transit_service.py) instead of polling the MTA itself.
+
+    Lanes come from the same config sections; getArrivals(), nextUpdateDelay()
+    and the queue behave like the local module. The connection is kept open
+    and re-established with backoff, and the last timelines keep the board
+    going while the service is unreachable.
+    """
+
+    def _init_feeds(self, config):
+        self.address = config.get('MTA', 'service_address', fallback=DEFAULT_SERVICE_ADDRESS)
+        self.next_due = 0  # Service's next refresh, 0 while not connected
+        self.snapshot_pending = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        print(f"[Transit Client] Using transit service at {self.address}")
+
+    def _run(self):
+        backoff = 1
+        while True:
+            try:
+                sock = connect(self.address)
+                try:
+                    send_message(sock, {'subscribe': list(self.lanes.values())})
+                    print(f"[Transit Client] Subscribed {len(self.lanes)} lanes")
+                    backoff = 1
+                    for message in read_messages(sock):
+                        self._apply(message)
+                finally:
+                    sock.close()
+                print("[Transit Client] Service closed the connection")
+            except (OSError, ValueError) as e:
+                print(f"[Transit Client] Service unavailable, retrying in {backoff}s: {e}")
+            self.next_due = 0
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def _apply(self, message):
+        lanes = message.get('lanes')
+        if lanes is None:
+            return
+        # Lanes are answered in subscription order
+        self.timelines = {
+            lane_key: ArrivalTimeline(tuple(arrival) for arrival in arrivals)
+            for lane_key, arrivals in zip(self.lanes, lanes)
+        }
+        self.next_due = message.get('next_due', 0)
+        self.snapshot_pending = True
+
+    def getArrivals(self):
+        """Upcoming train arrivals for each lane from the last snapshot the service sent."""
+        result = self._get_cached_with_updated_times() or []
+        if self.snapshot_pending:
+            self.snapshot_pending = False
+            if result:
+                self.queue.put(result)
+        return result
+
+    def nextUpdateDelay(self):
+        """Seconds until just after the service's next refresh or a shown minute ticks over"""
+        current_time = time.time()
+        wake = self.next_due + 1 if self.next_due else current_time + 5
+        return min(60, max(1, self._next_board_change(current_time, wake) - current_time))
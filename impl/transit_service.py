@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Shared transit data service.
+
+One process owns fetching, parsing and indexing the MTA feeds and publishes
+per-lane arrival timelines to every display that subscribes over a local
+Unix or TCP socket, so several boards in one building share a single set
+of upstream requests. Displays opt in with
+
+    [MTA]
+    service_address = unix:/tmp/matrix-transit.sock
+
+which makes controller_v3.py use modules.transit_client.TransitClient.
+
+Protocol (newline-delimited JSON):
+    client -> {"subscribe": [{"stop_ids": [...], "direction": "N", "lines": [...]}, ...]}
+    service -> {"lanes": [[[arrival_ts, line, terminal_stop_id], ...], ...], "next_due": ts}
+Lanes are answered in subscription order, after every refresh.
+"""
+
+import os, sys, time, socket, threading, argparse, configparser, warnings
+
+from modules.mta_module import MTAModule
+from modules.transit_client import DEFAULT_SERVICE_ADDRESS, parse_address, send_message, read_messages
+
+
+class TransitService:
+    def __init__(self, config, address):
+        self.address = address
+        self.module = MTAModule(config, lanes=[])
+        self.lock = threading.Lock()   # Guards the module and the subscriber list
+        self.wake = threading.Event()
+        self.subscribers = {}  # socket -> [lane keys]
+        self.send_locks = {}   # socket -> lock held for every write, so messages never interleave
+        self.lane_refs = {}    # lane key -> subscriptions using it; a lane is removed with its last one
+
+    def serve_forever(self):
+        listener = self._listen()
+        threading.Thread(target=self._accept, args=(listener,), daemon=True).start()
+        print(f"[Transit Service] Listening on {self.address}")
+
+        published = None
+        while True:
+            with self.lock:
+                self.module.getArrivals()
+                timelines = self.module.timelines
+                delay = self.module.nextRefreshTime() - time.time()
+            if timelines is not published:
+                published = timelines
+                self._broadcast()
+            self.wake.wait(timeout=min(60, max(0.5, delay)))
+            self.wake.clear()
+
+    def _listen(self):
+        kind, target = parse_address(self.address)
+        if kind == 'unix':
+            try:
+                os.unlink(target)  # Stale socket from a previous run
+            except FileNotFoundError:
+                pass
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(target)
+        listener.listen()
+        return listener
+
+    def _accept(self, listener):
+        while True:
+            sock, _ = listener.accept()
+            threading.Thread(target=self._serve_client, args=(sock,), daemon=True).start()
+
+    def _serve_client(self, sock):
+        send_lock = threading.Lock()
+        with self.lock:
+            self.send_locks[sock] = send_lock
+        try:
+            for message in read_messages(sock):
+                if not isinstance(message, dict):
+                    print(f"[Transit Service] Ignoring message that isn't an object: {message!r}")
+                    continue
+                lanes = message.get('subscribe')
+                if lanes is None:
+                    continue
+                with send_lock:
+                    with self.lock:
+                        keys = [self.module.addLane(self._lane_config(lane)) for lane in lanes]
+                        for key in keys:
+                            self.lane_refs[key] = self.lane_refs.get(key, 0) + 1
+                        self._release(self.subscribers.get(sock, []))  # A resubscription replaces the old lanes
+                        self.subscribers[sock] = keys
+                        snapshot = self._snapshot(keys)
+                    print(f"[Transit Service] Client subscribed to {', '.join(keys)} ({len(self.subscribers)} clients)")
+                    send_message(sock, snapshot)
+                self.wake.set()  # New lanes are fetched right away
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[Transit Service] Client error: {e}")
+        finally:
+            with self.lock:
+                self._release(self.subscribers.pop(sock, []))
+                self.send_locks.pop(sock, None)
+            with send_lock:
+                sock.close()
+
+    def _release(self, keys):
+        """Drop one subscription's hold on keys, removing lanes no client uses any more (call with lock held)"""
+        for key in keys:
+            self.lane_refs[key] -= 1
+            if not self.lane_refs[key]:
+                del self.lane_refs[key]
+                self.module.removeLane(key)
+
+    @staticmethod
+    def _lane_config(lane):
+        return {
+            'stop_ids': [str(stop_id) for stop_id in lane['stop_ids']],
+            'direction': str(lane['direction']),
+            'lines': [str(line) for line in lane['lines']],
+        }
+
+    def _snapshot(self, keys):
+        now = time.time()
+        return {
+            'lanes': [self.module.timelines[key].upcoming(now) for key in keys],
+            'next_due': self.module.nextRefreshTime(),
+        }
+
+    def _broadcast(self):
+        with self.lock:
+            messages = [(sock, self.send_locks[sock], self._snapshot(keys)) for sock, keys in self.subscribers.items()]
+        for sock, send_lock, message in messages:
+            with send_lock:
+                try:
+                    send_message(sock, message)
+                except OSError:
+                    sock.close()  # Its reader thread drops the subscription
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared MTA transit data service for several displays')
+    parser.add_argument('-a', '--address', help=f'unix:/path or tcp:host:port (default: [MTA] service_address '
+                                                f'or {DEFAULT_SERVICE_ADDRESS})')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read('../config.ini')
+    address = args.address or config.get('MTA', 'service_address', fallback=DEFAULT_SERVICE_ADDRESS)
+    TransitService(config, address).serve_forever()
+
+
+if __name__ == '__main__':
+    try:
+        warnings.filterwarnings("ignore", category=DeprecationWarning)
+        main()
+    except KeyboardInterrupt:
+        print('Interrupted with Ctrl-C')
+        sys.exit(0)
@@ -6,7 +6,8 @@ import sys
 import json
 import subprocess
 import configparser
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, render_template, request, redirect, url_for, flash
+from modules.stop_index import StopIndex
 
 # Check if we're running on a Raspberry Pi (Linux with systemd)
 IS_RASPBERRY_PI = sys.platform == 'linux'
@@ -92,6 +93,46 @@ def set_schedule(enabled, off_time, on_time, timezone):
                           capture_output=True, timeout=5)
         except Exception:
             pass
+    wake_display()
+
+def wake_display():
+    """Signal the display controller (SIGUSR1) to re-read the schedule, ending deep sleep if it no longer applies."""
+    if IS_RASPBERRY_PI:
+        try:
+            subprocess.run(['sudo', 'systemctl', 'kill', '--kill-who=main', '--signal=SIGUSR1', 'matrix'],
+                          capture_output=True, timeout=5)
+        except Exception:
+            pass
+
+_stop_index = None
+
+def get_stop_index():
+    """The compiled GTFS stop index, or None if it can't be opened (stop IDs are then not checked)."""
+    global _stop_index
+    if _stop_index is None:
+        try:
+            _stop_index = StopIndex.open()
+        except Exception as e:
+            print(f"Stop index unavailable, stop IDs won't be validated: {e}")
+            _stop_index = False
+    return _stop_index if _stop_index is not False else None
+
+def stop_id_errors(lane_name, stop_ids):
+    """Error messages for entries of a comma-separated stop_ids field that aren't subway stations."""
+    index = get_stop_index()
+    if index is None:
+        return []
+    errors = []
+    for stop_id in (part.strip() for part in stop_ids.split(',')):
+        if not stop_id or index.is_station(stop_id):
+            continue
+        stop = index.lookup(stop_id)
+        if stop is not None:
+            # A platform ID like R20N: the direction is chosen separately
+            errors.append(f"{lane_name}: use station ID {stop.parent} ({stop.name}) instead of {stop_id}")
+        else:
+            errors.append(f"{lane_name}: unknown stop ID {stop_id}")
+    return errors
 
 @app.route('/')
 def index():
@@ -120,6 +161,14 @@ def index():
 @app.route('/save', methods=['POST'])
 def save():
     """Save configuration and restart the display service."""
+    # Reject unknown stop IDs before anything is written
+    errors = (stop_id_errors('Lane 1', request.form.get('lane1_stop_ids', 'R20')) +
+              stop_id_errors('Lane 2', request.form.get('lane2_stop_ids', 'L03')))
+    if errors:
+        for error in errors:
+            flash(error)
+        return redirect(url_for('index'))
+
     config = read_config()
     
     # Update Matrix settings